@@ -0,0 +1,98 @@
+#
+# Matthew Epstein
+# budget.py
+# Limits how much a program may do, so that a program nobody has checked (eg.
+# one a user submitted) can't run forever or take all of the machine's memory.
+# There are four limits: the number of steps the evaluator takes (each node of
+# a tree that is evaluated is one step), the number of seconds the program may
+# run for, the number of elements a list may have, and the resident memory of
+# the interpreter, in KiB.  Each is off unless pscm is given the matching
+# option or an Interpreter (see embed.py) is created with it.  A program that
+# goes over a limit stops with an error naming the limit, which, unlike other
+# errors, check-error does not catch.
+# Steps are counted as they are taken.  The clock and the memory are looked at
+# before each top-level expression and after each primitive or function call
+# returns (see check()).  A program that is waiting for input, sleeping, or in
+# the middle of a single primitive (eg. (10000 !)) is not stopped until that
+# primitive returns.  Lists are checked as they are built, and range,
+# rangeFrom, and init check how long their list would be before building it.
+# Every check is skipped when budget.enabled is False, as with stats.py.
+# Of the other p-scheme files, this file "includes" only memprofile.py and
+# values.py.
+#
+
+
+import time
+import memprofile
+from values import *
+
+enabled = False
+max_steps = None
+max_seconds = None
+max_list_length = None
+max_memory = None # in KiB
+steps = 0 # the steps taken since start()
+deadline = None # the time at which the program runs out of time
+
+
+# Sets the four limits.  A limit that is None is not enforced.  Raises an
+# ImportError if a memory limit is given but the memory of the interpreter
+# cannot be measured on this system.
+def set_limits(new_steps, new_seconds, new_list_length, new_memory):
+    global enabled, max_steps, max_seconds, max_list_length, max_memory
+    if new_memory != None:
+        import resource
+    (max_steps, max_seconds, max_list_length, max_memory) = \
+                        (new_steps, new_seconds, new_list_length, new_memory)
+    enabled = limits() != (None, None, None, None)
+
+
+# Returns the four limits, in the order set_limits() takes them.
+def limits():
+    return (max_steps, max_seconds, max_list_length, max_memory)
+
+
+# Starts counting steps and time from zero.  Called whenever a program (or,
+# when embedding, a call to run()) begins.
+def start():
+    global steps, deadline
+    steps = 0
+    deadline = None if max_seconds == None else time.time() + max_seconds
+
+
+# Called by the evaluator for each step it takes.
+def step():
+    global steps
+    steps += 1
+    if max_steps != None and steps > max_steps:
+        __exceeded("Step limit", "{} steps".format(max_steps))
+
+
+# Looks at the clock and the memory.  Called before each top-level expression
+# and, with the value it produced, after each primitive or function call.
+# Every value is a string, so one that is longer than the memory limit is
+# enough to go over it, whatever the memory of the interpreter says.
+def check(val=None):
+    if deadline != None and time.time() > deadline:
+        __exceeded("Time limit", "{} seconds".format(max_seconds))
+    if max_memory != None and ((val != None and len(val) > max_memory * 1024) \
+                                    or memprofile.resident() > max_memory):
+        __exceeded("Memory limit", "{} KiB".format(max_memory))
+
+
+# Called before a list of the given length is built.
+def check_list_length(length):
+    if max_list_length != None and length > max_list_length:
+        __exceeded("List length limit", "{} elements".format(max_list_length))
+
+
+# Used by range and rangeFrom in place of range(), so that the length of the
+# list is checked before the list is built.
+def limited_range(*args):
+    if enabled:
+        check_list_length(len(xrange(*args)))
+    return range(*args)
+
+
+def __exceeded(limit, amount):
+    raise EvalError("Error: {} exceeded ({})".format(limit, amount), "limit")
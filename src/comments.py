@@ -1,112 +1,114 @@
-# 
+#
 # Matthew Epstein
 # comments.py
-# This file is responsible for handling comment sanitization and for raising
-# errors if a comment or a string is entered in an incorrect format.  The
-# handle_comments() function is admittedly difficult to read, and I apologize
-# for that.  I ran into a number of issues accounting for the various edge-cases
-# and the function kept growing and growing.
+# This file is p-scheme's front end.  It reads the lines of a file once, from
+# top to bottom, stripping comments, checking that comments and strings are
+# of the correct format, and joining lines that are continued with <~ into the
+# expressions (or "logical lines") that are actually evaluated.  Each line is
+# scanned a single time, keeping track of whether the scanner is within a
+# string or within a block comment, so that a comment marker inside a string
+# (eg. "!@") is left alone.
 #
 
 
+import re
 import global_vars
 from error_handling import *
 
-comment = False
-comment_start_line = None
 C_START = "!@"
 C_END = "#$"
 QUOTE = "\""
+MARKERS = re.compile("\"|!@|#\$")
 
 
-# Ensures that comments are of the correct format
-def handle_strings(expression, lineCount, numLines, origLines):
-    if expression.count("\"") % 2 == 0:
-        return
-    val = "Error: It never ends"
-    return origLines.RaiseException(lineCount, numLines, val)
+# Strips the comments from a single line of code.  in_comment is whether the
+# line begins within a block comment.  Returns the stripped line, whether the
+# line ends within a block comment, and an error message if a comment ends
+# without starting (None otherwise).
+def strip_comments(line, in_comment):
+    stripped = []
+    in_string = False
+    pos = 0
+    while True:
+        if in_comment:
+            end = line.find(C_END, pos)
+            if end == -1:
+                break
+            in_comment = False
+            pos = end + 2
+            continue
 
+        marker = MARKERS.search(line, pos)
+        if marker == None:
+            stripped.append(line[pos:])
+            break
+        if marker.group() == QUOTE:
+            in_string = not in_string
+        if marker.group() == QUOTE or in_string:
+            stripped.append(line[pos:marker.end()])
+        elif marker.group() == C_START:
+            stripped.append(line[pos:marker.start()])
+            in_comment = True
+        else:
+            return ("", False, "Error: Comment ends without starting")
+        pos = marker.end()
 
+    return ("".join(stripped), in_comment, None)
 
-# Sanitizes comments from a line of code
-def handle_comments(line, lines, lineCount, origLines):
-    loop = True
-    origLine = lines[line]
-    currLine = lines[line]
-    
-    toReplace = "q"
-    while toReplace in lines[line]:
-        toReplace = toReplace + "q"
-    markerA = toReplace + '1'
-    markerB = toReplace + '2'
 
-    global comment, comment_start_line, C_START, C_END, QUOTE
-    while loop:
-        loop = False
-        # deals with the end of block comments and the case of !@\n"#$"
-        if C_END in currLine and comment:
-            comment = False
-            currLine = currLine[currLine.find(C_END)+2:]
-            loop = True       
-        #deals with the middle of block comments
-        if comment and C_END not in currLine and currLine != "":
-            currLine = ""
-            loop = True
-        # deals with the start of block comments and checks for the "!@" case
-        if C_START in currLine and C_END not in currLine:
-            if currLine[:currLine.find(C_START)].count(QUOTE) % 2  == 1:
-                currLine = currLine[:currLine.find(C_START)] + markerA + \
-                           currLine[currLine.find(C_START)+2:]
-                loop = True
-            else:
-                comment_start_line = lineCount
-                comment = True
-                currLine = currLine[:currLine.find(C_START)]
-                loop = False
-        # deals with comments that are contained on one line, comments that end
-        # without starting, and checks for the "#$" case
-        if currLine.find(C_START) < currLine.find(C_END) and not comment:
-            if currLine.find(C_START) == -1:
-                if currLine[:currLine.find(C_END)].count(QUOTE) % 2  == 1:
-                    currLine = currLine[:currLine.find(C_END)] + markerB \
-                             + currLine[currLine.find(C_END)+2:]
-                    loop = True
-                elif not comment:
-                    val = "Error: Comment ends without starting"
-                    comment = False
-                    return origLines.RaiseException(lineCount, 1, val)
-                else:
-                    loop = True
-            else:
-                if currLine[:currLine.find(C_START)].count(QUOTE) % 2  == 1:
-                    currLine = currLine[:currLine.find(C_START)] \
-                            + markerA + currLine[currLine.find(C_START)+2:]
-                    loop = True
-                else:
-                    currLine = currLine[:currLine.find(C_START)] + \
-                                  currLine[currLine.find(C_END)+2:]
-                    loop = True
-        # deals with the invalid case of comments in the #$___!@ format when
-        # there is no comment currently being written
-        elif currLine.find(C_START) > currLine.find(C_END) and not comment:
-            if currLine[:currLine.find(C_END)].count(QUOTE) % 2  == 1:
-                currLine = currLine[:currLine.find(C_END)] \
-                 + markerB + currLine[currLine.find(C_END)+2:]
-                loop = True
-            elif currLine[:currLine.find(C_START)].count(QUOTE) % 2  == 1:
-                currLine = currLine[:currLine.find(C_START)] \
-                 + markerA + currLine[currLine.find(C_START)+2:]
-                loop = True
-            else:
-                val = "Error: Comment ends without starting"
-                comment = False
-                return origLines.RaiseException(lineCount, 1, val)
-    if lineCount == len(lines) and comment \
-                                    and not global_vars.function_error_check:
-        val = "Error: It never ends"
-        comment = False
-        origLines.RaiseException(comment_start_line, 1, val, 3)
+# Turns the lines of a file into the list of expressions to be evaluated.  Each
+# expression is a tuple (status, expression, lineCount, numLines), where
+# lineCount is the number of the expression's last line and numLines is the
+# number of lines the expression takes up.  The status is "finished" for a
+# complete expression and "error" for a line with a badly formatted comment or
+# string, in which case the expression is the error message, so that the
+# error is raised once the evaluator reaches that line.  If the file ends in
+# the middle of a continued expression, the last status is "unfinished".
+# Continued lines are prepended to the expression in reverse order (ie. the
+# line just above the last line of the expression comes right after it).
+def logical_lines(lines, origLines):
+    logical = []
+    in_comment = False
+    comment_start_line = None
+    continued = [] # the lines continued with <~, from the top down
+    numLines = 1
 
-    return currLine.replace(markerA, "!@").replace(markerB, "#$")
+    for lineCount in range(1, len(lines)+1):
+        (line, still_in_comment, error) = \
+                            strip_comments(lines[lineCount-1], in_comment)
+        if error != None:
+            logical.append(("error", error, lineCount, 1))
+            continued = []
+            numLines = 1
+            continue
+        if still_in_comment and not in_comment:
+            comment_start_line = lineCount
+        in_comment = still_in_comment
 
+        line = line.lstrip()
+        if line == "":
+            if numLines != 1:
+                numLines += 1
+            continue
+        if line[:2] == "<~":
+            continued.append(line[2:])
+            numLines += 1
+            continue
 
+        if continued != []:
+            continued.reverse()
+            line = " ".join([line] + continued + [""])
+        if line.count(QUOTE) % 2 == 1:
+            logical.append(("error", "Error: It never ends", lineCount, \
+                                                                    numLines))
+        else:
+            logical.append(("finished", line, lineCount, numLines))
+        continued = []
+        numLines = 1
+
+    if in_comment:
+        val = "Error: It never ends"
+        origLines.RaiseException(comment_start_line, 1, val, 3)
+    if continued != []:
+        logical.append(("unfinished", "", len(lines), numLines))
+    return logical
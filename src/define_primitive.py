@@ -6,30 +6,40 @@
 # of the correct type, and--if these two specifications were satisfied--gets the
 # values that those arguments represent (eg. if x=3 and the argument passed to
 # the function is x, then x will be the argument and 3 the associated value).
+# If any of this fails, an EvalError (see values.py) is raised.
 # The function gets its own file because it is used by both primitives.py and
 # node.py.  It can't go in primitives.py because then node.py wouldn't have
 # access to it, but it doesn't make much sense for the function to go in
 # node.py either.
 #
 
+import stats
 from list_string_handling import *
 from type_checking import *
 
 
 # See the comment at the top of the file for this function's purpose.
 def definePrimitive(args, constraints, varEnv, locEnv):
+    if stats.enabled:
+        stats.count("definePrimitive.calls")
     if len(args) != len(constraints):
-        return ("error", "Error: Incorrect number of arguments")
+        raise EvalError("Error: Incorrect number of arguments")
+
+    val_list = __known_values(args, constraints, varEnv, locEnv)
+    if val_list != None:
+        if stats.enabled:
+            stats.count("definePrimitive.known_types")
+        return val_list
 
     cleanArgs = [] # strips dot from argument name
     for i in range(len(args)):
-        if isList(args[i]) and string_check(args[i]) != None:
-            return string_check(args[i])
+        # lists that are already Values were built by p-scheme and so must be
+        # in the correct format
+        if isList(args[i]) and not isinstance(args[i], Value) and \
+                                            string_check(args[i]) != None:
+            raise EvalError(string_check(args[i])[1])
         (toAppend, constraints[i][0]) = \
                         general_type(args[i], constraints[i], varEnv, locEnv)
-        #print toAppend
-        if toAppend != "" and toAppend[0] == "error":
-            return toAppend
         cleanArgs.append(toAppend)
 
     constraints[0][0] = \
@@ -38,21 +48,60 @@ def definePrimitive(args, constraints, varEnv, locEnv):
     for i in range(len(cleanArgs)):
         val_list.append(getValofType(cleanArgs[i], constraints[i][0], varEnv, \
                                                                         locEnv))
-        if isinstance(val_list[i], tuple) and val_list[i][0] == "error":
-            return val_list[i]
 
     for i in val_list:
-        if isList(i) and list_check(i, varEnv, locEnv) != None:
-            return list_check(i, varEnv, locEnv)
+        if isList(i):
+            list_check(i, varEnv, locEnv)
 
     for i in range(len(val_list)):
         try:
             if val_list[i][:2] == "//" and varEnv.inEnv(val_list[i][2:]):
                 val_list[i] = val_list[i][2:]
             elif val_list[i][:2] == "//" and not funEnv.inEnv(val_list[i][2:]):
-                return ("error", "Function does not exist")
+                raise EvalError("Function does not exist")
         except:
             pass
 
     return val_list
 
+
+# The type of a Value was settled when the Value was made (when the line was
+# tokenized, for literals, or by the primitive that produced it), and the type
+# of a variable was recorded when it was bound, so an argument that is a Value
+# or a variable with only one type only needs that type compared with its
+# constraint.  If every argument is one of these, this function does just
+# that, linking the constraints exactly as general_type() would, and returns
+# the values of the arguments.  It returns None if the checks above are needed
+# after all: if an argument is a variable with more than one type (or none), a
+# dotted name, or a list that may name a variable, or if an argument is of the
+# wrong type (so that the checks above raise the error).  The types are looked
+# up on every call rather than recorded in the tree when a function body is
+# compiled, since a compiled tree is reused for every call of the function
+# (see userFun() in primitives.py) and its parameters and variables may have
+# other types on the next call.
+def __known_values(args, constraints, varEnv, locEnv):
+    known = [__known_binding(arg, varEnv, locEnv) for arg in args]
+    if None in known:
+        return None
+    for (val, val_type) in known:
+        if val_type == "list" and \
+                not (isinstance(val, Value) and literal_elements(val)):
+            return None
+    for i in range(len(known)):
+        if known[i][1] not in constraints[i][0]:
+            return None
+        constraints[i][0] = [known[i][1]]
+    return [casted(val) for (val, val_type) in known]
+
+
+# Returns the value and type of an argument that is a Value or a variable with
+# only one type, or None for any other argument.  A variable in the local
+# environment hides one of the same name in the global environment.
+def __known_binding(arg, varEnv, locEnv):
+    if isinstance(arg, Value):
+        return (arg, arg.val_type)
+    if not isinstance(arg, Token) or arg.kind != "identifier":
+        return None
+    if locEnv.inEnv(arg):
+        return locEnv.getSingleBinding(arg)
+    return varEnv.getSingleBinding(arg)
@@ -0,0 +1,139 @@
+#
+# Matthew Epstein
+# embed.py
+# Holds the Interpreter class, which lets a python program run p-scheme
+# without starting pscm in a new process.  An interpreter keeps its variables
+# and functions from one call to the next, so a program can load its functions
+# once and then evaluate expressions or call functions as many times as it
+# likes.  Results come back as python values: numbers as ints, longs, or
+# floats, booleans as bools, strings as strs (without their quotes), lists as
+# python lists, and Nothing as None.  An error (or a failed claim) raises a
+# PScmError (see error_handling.py) instead of being printed and ending the
+# process.  Nothing is printed either: what a program prints is kept until it
+# is asked for with take_output(), unless the interpreter was given a stream
+# to print to.
+# For example:
+#     interpreter = Interpreter()
+#     interpreter.run("[n] sq define\n\tn n *\ndone")
+#     interpreter.call("sq", 12)          # returns 144
+#     interpreter.run("(3 sq) x val")
+#     interpreter.run("x 1 +")            # returns 10
+#     interpreter.run("x print")          # returns None
+#     interpreter.take_output()           # returns "9\n"
+# The source given to run() is a p-scheme program without its header.  Line
+# numbers in errors count from its first line.  Programs that read input (with
+# input or getch) still read it from standard input, and a program that calls
+# exit simply stops, as if its source ended there.
+# An interpreter can be given limits on what each call to run() or call() may
+# do (see budget.py), for running programs that can't be trusted:
+#     interpreter = Interpreter(max_steps=100000, max_seconds=2)
+# A program that goes over one of them raises a PScmError naming the limit.
+# The memory limit counts all of the memory of the python program the
+# interpreter is in, not just what p-scheme uses.
+#
+
+
+from cStringIO import StringIO
+import budget
+import global_vars
+import output
+from toplevel import *
+
+
+class Interpreter:
+
+    # Creates an interpreter in which only the primitives are defined.  If
+    # stream (a file or anything else with write() and flush()) is given,
+    # what programs print is written to it.  name is what errors call the
+    # source, in place of a file name.  The four limits are those of
+    # budget.py; a limit that is None is not enforced.
+    def __init__(self, stream=None, name="<string>", max_steps=None, \
+                 max_seconds=None, max_list_length=None, max_memory=None):
+        (self.varEnv, self.funEnv) = addPrimitives()
+        self.limits = (max_steps, max_seconds, max_list_length, max_memory)
+        self.stream = stream
+        self.printed = StringIO()
+        self.name = name
+
+
+    # Defines the functions in source and evaluates its top-level
+    # expressions in order.  Returns the result of the last expression, or
+    # None if there were none.
+    def run(self, source):
+        lines = source.split("\n")
+        origLines = OriginalLines(lines)
+        saved = (global_vars.filename, global_vars.compiled_trees, \
+                                                output.stream, budget.limits())
+        budget.set_limits(*self.limits)
+        budget.start()
+        global_vars.filename = self.name
+        global_vars.compiled_trees = dict() # see userFun() in primitives.py
+        output.set_stream(self.printed if self.stream == None else self.stream)
+        val = "Nothing"
+        try:
+            logical = logical_lines(lines, origLines)
+            function_check(logical, origLines, self.funEnv)
+            for exp in logical:
+                if exp == None:
+                    continue
+                (status, fullExp, lineCount, numLines) = exp
+                if status == "error":
+                    origLines.RaiseException(lineCount, numLines, fullExp)
+                if status == "unfinished":
+                    error = "Error: Incorrect number of arguments"
+                    origLines.RaiseException(lineCount, numLines, error)
+                val = evaluate_expression(fullExp, lineCount, numLines, \
+                                            origLines, self.varEnv, self.funEnv)
+        except SystemExit: # the program called exit
+            val = "Nothing"
+        finally:
+            global_vars.reset()
+            global_vars.function_check = False
+            output.set_stream(saved[2])
+            budget.set_limits(*saved[3])
+            (global_vars.filename, global_vars.compiled_trees) = saved[:2]
+        return self.__python_value(val)
+
+
+    # Calls the function name with the given python values as its arguments
+    # and returns its result.
+    def call(self, name, *args):
+        return self.run(" ".join(["("] + [self.__literal(arg) \
+                                                for arg in args] + [name, ")"]))
+
+
+    # Returns what programs have printed since the last call, and forgets it.
+    def take_output(self):
+        text = self.printed.getvalue()
+        self.printed = StringIO()
+        return text
+
+
+    # Turns a python value into a p-scheme literal.
+    def __literal(self, arg):
+        if isinstance(arg, bool):
+            return "true" if arg else "false"
+        if arg == None:
+            return "Nothing"
+        if isinstance(arg, NUMBER_TYPES):
+            return repr(normalize_num(arg)).rstrip("L")
+        if isinstance(arg, (list, tuple)):
+            return "[" + ", ".join([self.__literal(x) for x in arg]) + "]"
+        return "\"" + str(arg).replace("\"", "<'>") + "\""
+
+
+    # Turns a p-scheme value into a python value.
+    def __python_value(self, val):
+        if isinstance(val, bool):
+            return val
+        if isNum(val):
+            return native_num(val)
+        if isBool(val):
+            return val == "true"
+        if isNothing(val):
+            return None
+        if isList(val):
+            return [self.__python_value(x) for x in string_to_list(val)]
+        if isString(val):
+            return val[1:-1].replace("<'>", "\"")
+        return val
@@ -11,16 +11,30 @@
 
 import time
 import global_vars
+import stats
+from values import *
 
 class Environment:
 
-    # Initializes the environment to an empty dictionary
+    # Initializes the environment to an empty dictionary.  version goes up
+    # every time a binding is added or changed, so that anything remembered
+    # about the environment (see the inline caches in node.py) can tell when
+    # it has gone out of date.  reads and writes, if they are not None, are
+    # sets to which the names of the variables that are looked up and bound
+    # are added (see watch.py).
     def __init__(self):
         self.env = dict()
         self.PMs = dict() # only necessary for the function environment
+        self.version = 0
+        self.reads = None
+        self.writes = None
 
     # Returns True if a variable is in the environment and False otherwise
     def inEnv(self, var):
+        if stats.enabled:
+            stats.count("Environment.lookups")
+        if self.reads != None:
+            self.reads.add(var)
         try:
             tmp = self.env[var]
             return True
@@ -30,6 +44,10 @@ class Environment:
     # Returns True if a variable of the specified type is in the environment and
     # False otherwise
     def inEnvandType(self, var, varType):
+        if stats.enabled:
+            stats.count("Environment.lookups")
+        if self.reads != None:
+            self.reads.add(var)
         try:
             existing_var = self.env[var]
             for in_existing_var in existing_var:
@@ -44,6 +62,12 @@ class Environment:
     # two previous values are of differing types, this would not occur with the
     # normal addBind() function.
     def addBindit(self, var, val):
+        if stats.enabled:
+            stats.count("Environment.binds")
+        global_vars.invalidate_cse(var)
+        self.version += 1
+        if self.writes != None:
+            self.writes.add(var)
         if self.__getType(val) == "variable":
             self.env[var] = self.env[val]
         else:
@@ -63,6 +87,12 @@ class Environment:
     # case, the new value overwrites the previous value that was the same type
     # (Option C).
     def addBind(self, var, val, constraints=None):
+        if stats.enabled:
+            stats.count("Environment.binds")
+        global_vars.invalidate_cse(var)
+        self.version += 1
+        if self.writes != None:
+            self.writes.add(var)
         if self.__getType(val) == "variable":
             self.__addBindVar(var, val, constraints)
         else:
@@ -115,10 +145,26 @@ class Environment:
 
     # Returns the value of the variable that has type varType.
     def getVal(self, var, varType):
+        if stats.enabled:
+            stats.count("Environment.lookups")
+        if self.reads != None:
+            self.reads.add(var)
         for existing_var in self.env[var]:
             if existing_var[1] == varType:
                 return existing_var[0]
 
+    # Returns the value and type of a variable that has values of only one
+    # type, or None if the variable has more than one type (or none at all).
+    def getSingleBinding(self, var):
+        if stats.enabled:
+            stats.count("Environment.lookups")
+        if self.reads != None:
+            self.reads.add(var)
+        bindings = self.env.get(var, [])
+        if len(bindings) != 1:
+            return None
+        return bindings[0]
+
     # Returns the type a variable was first declared as.  Necessary for when
     # two variables are of the same, multiple types.  The type chosen to use is
     # whatever type was declared first for the first variable in the expression.
@@ -137,6 +183,8 @@ class Environment:
 
     # Clears an environment.
     def empty(self):
+        global_vars.invalidate_cse(None)
+        self.version += 1
         self.env = dict()
 
     # Gets the arrity of a function.  Returns None if caled on a variable.
@@ -166,11 +214,15 @@ class Environment:
     # Returns the type of a variable.  This is a private function, only intended
     # to be used by the bind functions.
     def __getType(self, arg):
+        if isinstance(arg, Value):
+            return arg.val_type
         if arg == "true" or arg == "false" or arg == "maybe" \
                           or arg == True or arg == False:
             return "bool"
         if arg == "Nothing":
             return "nonetype"
+        if isinstance(arg, NUMBER_TYPES):
+            return "num"
         argStr = str(arg)
         if argStr == "" or (argStr[0] == "\"" and argStr[-1] == "\""):
             return "str"
@@ -11,6 +11,22 @@
 
 import sys
 import global_vars
+import output
+
+
+# Raised by RaiseException() when an error (or a failed claim) stops a
+# program.  message is the error itself (eg. "Error: Word is reserved"),
+# first_line and last_line are the lines of the expression that erred, and
+# report is everything pscm prints about the error, including the lines.
+class PScmError(Exception):
+
+    def __init__(self, message, first_line, last_line, report):
+        Exception.__init__(self, message)
+        self.message = message
+        self.first_line = first_line
+        self.last_line = last_line
+        self.report = report
+
 
 class OriginalLines:
 
@@ -46,16 +62,20 @@ class OriginalLines:
     # message is the Declaration of Independence, special=1.  When special=2,
     # a claim failed, which isn't quite the same as an error being raised, but
     # still functions very similarly and is thus handled in this function as
-    # well.  Finally, in the case where special=3, it means there was an error
-    # in a function definition.  In this case the function simply returns and
-    # allows the code to run until that error eventually manifests itself once
-    # that function is actually called.
+    # well (a program going over a limit in budget.py is reported the same
+    # way, so that check-error can't catch it either).  Finally, in the case
+    # where special=3, it means there was an error in a function definition.
+    # In this case the function simply returns and allows the code to run until
+    # that error eventually manifests itself once that function is actually
+    # called.  Otherwise, a PScmError is raised, which pscm catches to print
+    # the report and exit.
     def RaiseException(self, lineNum, numLines, error, special=0):
         if global_vars.function_check and special != 3:
             return "error"
         if global_vars.check_error and special != 2:
             return ("not_error", "Check failed, as expected")
 
+        output.flush()
         lines = ""
         for i in range(numLines,0,-1):
             lines = lines + self.getLine(lineNum-i) + "\n"
@@ -67,15 +87,14 @@ class OriginalLines:
         else:
             lineStr = "line " + str(lineNum)
 
+        report = "  File {}; {}\n    {}".format(global_vars.filename, \
+                                                               lineStr, lines)
         if special == 1:
             open("dec.txt", 'r')
             decOfInd = [line.rstrip('\n') for line in open("dec.txt")]
-            sys.stdout.write("  File {}; {}\n    {}"\
-                                .format(global_vars.filename, lineStr, lines))
             for line in decOfInd:
-                print line
+                report += line + "\n"
         else:
-            print("  File {}; {}\n    {}{}"\
-                    .format(global_vars.filename, lineStr, lines, error))
-        exit(0)
+            report += "{}\n".format(error)
+        raise PScmError(error, lineNum-numLines+1, lineNum, report)
 
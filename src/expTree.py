@@ -9,39 +9,38 @@
 # to differentiate between a function with arrity 0 and variables and literals,
 # the former is said to have 0 children while the latter is said to have -1
 # children.  In addition to the tree itself, the class holds the expression
-# as a string and  counters for the number of nodes in the tree (used to
-# determine each node's ID number while the tree is being built) and the number
-# of available spots in the tree (used for the tree rebalancing algorithm
+# (with the position of the first value that has not yet been made into a
+# node) and counters for the number of nodes in the tree (used to determine
+# each node's ID number while the tree is being built) and the number of
+# available spots in the tree (used for the tree rebalancing algorithm
 # discussed in node.py).
 #
 
 
 
-class ExpressionTree:
+class ExpressionTree(object):
+    __slots__ = ("tree", "string", "pos", "noneCount", "num_nodes")
+
     # Initializes the class with starting values.
     def __init__(self, string):
         self.tree = None
-        self.origString = string
         self.string = string
+        self.pos = 0
         self.noneCount = 0
         self.num_nodes = 0
 
     # Returns the first value of the expression (whether it be function,
-    # variable or literal) and updates the string so that the first value
-    # is no longer in the expression
+    # variable or literal) that has not yet been returned, or None if there
+    # are no values left.
     def update_string(self):
-        try:
-            first = self.string[0]
-            self.string = self.string[1:]
-        except:
-            first = None
-        return first
+        if self.pos == len(self.string):
+            return None
+        self.pos += 1
+        return self.string[self.pos-1]
 
     # The six remaining functions below are all fairly self-explanatory.
     def checkIfRoot(self):
-        if len(self.origString) == len(self.string)+1:
-            return True
-        return False
+        return self.pos == 1
 
     def updateNoneCount(self, new_children):
         self.noneCount = self.noneCount + new_children
@@ -50,7 +49,7 @@ class ExpressionTree:
         return self.noneCount
 
     def get_string_length(self):
-        return len(self.string)
+        return len(self.string) - self.pos
 
     def update_num_nodes(self):
         self.num_nodes += 1
@@ -0,0 +1,45 @@
+#
+# Matthew Epstein
+# frames.py
+# Holds the functions that let real-time programs (eg. games) run at a steady
+# speed.  A program that redraws the screen once per pass through its main
+# loop calls tick() once per pass: tick() waits until the current frame is
+# over, so each pass takes the same amount of time no matter how long the
+# work within it took.  Waiting is done by sleeping, never by spinning.
+#
+
+
+import time
+import output
+
+last_frame = None # when the current frame started
+
+
+# Waits until seconds have passed since the previous call to tick() (or since
+# the program started calling tick()).  A program that has fallen behind does
+# not wait at all, and the next frame starts from now rather than trying to
+# make up for the lost time.
+def tick(seconds):
+    global last_frame
+    if seconds < 0:
+        raise ValueError("frames cannot be negative")
+    output.flush()
+    now = time.time()
+    if last_frame == None:
+        last_frame = now
+    deadline = last_frame + seconds
+    if deadline > now:
+        time.sleep(deadline - now)
+        last_frame = deadline
+    else:
+        last_frame = now
+    return "Nothing"
+
+
+# Waits for the given number of seconds.
+def sleep(seconds):
+    if seconds < 0:
+        raise ValueError("cannot sleep for a negative time")
+    output.flush()
+    time.sleep(seconds)
+    return "Nothing"
@@ -1,11 +1,24 @@
 #
 # Matthew Epstein
 # getch.py
-# Reads a single character from standard input.  All the code in this file was
-# shamelessly stolen from http://code.activestate.com/recipes/134892/
+# Reads a single character from standard input, either waiting as long as it
+# takes (getch) or only until a deadline (getch.timeout()).  The original code
+# in this file was shamelessly stolen from
+# http://code.activestate.com/recipes/134892/
+# That code put the terminal into raw mode and back again for every character
+# that was read.  Programs that read keys continuously (eg. the games in the
+# examples directory) now instead put the terminal into raw mode the first
+# time a character is read and leave it that way until the program exits
+# (or until a whole line is read; see read_line()).  Output is still
+# processed as normal and Ctrl-C still interrupts the program.
 #
 
 
+import atexit
+import sys
+import output
+
+
 class _Getch:
     def __init__(self):
         try:
@@ -13,23 +26,69 @@ class _Getch:
         except ImportError:
             self.impl = _GetchUnix()
 
-    def __call__(self): return self.impl()
+    # Anything the program has printed is shown before it waits for a key.
+    def __call__(self):
+        output.flush()
+        return self.impl()
+
+    # Returns the next character, or None if no character is typed within the
+    # given number of seconds.
+    def timeout(self, seconds):
+        output.flush()
+        return self.impl.timeout(seconds)
+
+    # Leaves raw mode (if the terminal is in it) so that a whole line can be
+    # read with the usual line editing.
+    def end_session(self): self.impl.end_session()
 
 
 class _GetchUnix:
     def __init__(self):
-        import tty, sys
+        import tty, termios
+        self.old_settings = None
 
     def __call__(self):
-        import sys, tty, termios
+        import os
+        self.__start_session()
+        return os.read(sys.stdin.fileno(), 1)
+
+    # Standard input is waited on with select even when it is not a terminal,
+    # so that a pipe that stays open but sends nothing can't hold the program
+    # past the deadline.
+    def timeout(self, seconds):
+        import os, select
+        self.__start_session()
         fd = sys.stdin.fileno()
-        old_settings = termios.tcgetattr(fd)
-        try:
-            tty.setraw(sys.stdin.fileno())
-            ch = sys.stdin.read(1)
-        finally:
-            termios.tcsetattr(fd, termios.TCSADRAIN, old_settings)
-        return ch
+        (ready, _, _) = select.select([fd], [], [], seconds)
+        if ready == []:
+            return None
+        ch = os.read(fd, 1)
+        return ch if ch != "" else None
+
+    def end_session(self):
+        import termios
+        if self.old_settings != None:
+            termios.tcsetattr(sys.stdin.fileno(), termios.TCSADRAIN, \
+                                                            self.old_settings)
+            self.old_settings = None
+
+    # Puts the terminal into raw mode if it is not in it already.  Returns
+    # False if standard input is not a terminal (eg. it is a file or a pipe),
+    # in which case characters are simply read as they come.
+    def __start_session(self):
+        import tty, termios
+        if self.old_settings != None:
+            return True
+        if not sys.stdin.isatty():
+            return False
+        fd = sys.stdin.fileno()
+        self.old_settings = termios.tcgetattr(fd)
+        tty.setraw(fd)
+        mode = termios.tcgetattr(fd)
+        mode[tty.OFLAG] = mode[tty.OFLAG] | termios.OPOST
+        mode[tty.LFLAG] = mode[tty.LFLAG] | termios.ISIG
+        termios.tcsetattr(fd, termios.TCSADRAIN, mode)
+        return True
 
 
 class _GetchWindows:
@@ -40,5 +99,26 @@ class _GetchWindows:
         import msvcrt
         return msvcrt.getch()
 
+    def timeout(self, seconds):
+        import msvcrt, time
+        deadline = time.time() + seconds
+        while not msvcrt.kbhit():
+            if time.time() >= deadline:
+                return None
+            time.sleep(0.01) # the console cannot be waited on with select
+        return msvcrt.getch()
+
+    def end_session(self):
+        pass
+
+
+getch = _Getch()
+atexit.register(getch.end_session)
+
 
-getch = _Getch()
\ No newline at end of file
+# Reads a line of input, leaving raw mode first if necessary.  Raw mode is
+# entered again the next time a single character is read.
+def read_line(prompt):
+    output.flush()
+    getch.end_session()
+    return raw_input(prompt)
@@ -24,7 +24,23 @@ PRIMITIVES = ["it", "+", "-", "*", "/", "%", "^", "!", "v/", "int", "and", \
 			  "check-expect", "empty", "if", "ifTrue", "ifFalse", "while", \
 			  "for", "claim", "define", "done", "wholesomeRemark", "exit", \
 			  "random", "write", "getch", "clear_screen", "map", "fold", \
-			  "filter", "all", "exists"]
+			  "filter", "all", "exists", "getchTimeout", "tick", "sleep", \
+			  "setCell", "writeRow", "present", "snapshot"]
+# Primitives whose result depends only on their arguments and that have no side
+# effects.  Subtrees made up of these primitives and literals are folded into a
+# single literal when a function body is first compiled, or before a top-level
+# loop runs (see Node.foldConstants()).  ! and ** are left out because they can
+# be arbitrarily expensive and the subtree may be in a branch that never runs.
+PURE_PRIMITIVES = ["+", "-", "*", "/", "%", "v/", "int", "and", "or", "xor", \
+                   "nand", "nor", "not", ">", "<", ">=", "<=", "=", "<>", "++"]
+# Primitives whose results may be shared between identical subtrees of the same
+# expression (see markCommonSubtrees() in node.py).  Unlike the primitives
+# above, their results can depend on the values of variables.
+CACHEABLE_PRIMITIVES = PURE_PRIMITIVES + ["!", "**", "get", "length", "null?", \
+                                          "today"]
+# Primitives whose lists a for loop steps through one element at a time
+# without ever building the list (see floop() in primitives.py).
+LAZY_SEQUENCES = ["range", "rangeFrom"]
 VARIABLE_RESERVED_TERMS = ["error", "it", "val", "check-expect", \
                            "check-error", "if", "ifTrue", "ifFalse", "while", \
                            "empty", "for", "in", "define", "done"]
@@ -33,13 +49,24 @@ user_function = 0
 curr_function = []
 check_error = False
 check_expect = False
-curr_tree = []
-function_error_check = False
+cse_caches = [] # the caches of the trees currently being evaluated
+compiled_trees = dict() # the trees of function bodies, made anew for each run
+watch_calls = None # the functions called, when recording them (see watch.py)
 
 def reset():
-    global user_function, curr_function, check_error, check_expect, curr_tree
+    global user_function, curr_function, check_error, check_expect
+    global cse_caches
     user_function = 0
     curr_function = []
     check_error = False
     check_expect = False
-    curr_tree = []
+    cse_caches = []
+
+# Called whenever a variable is bound.  Throws away every cached subtree result
+# that depends on the variable.  If var is None, every cached result is thrown
+# away.
+def invalidate_cse(var):
+    for cache in cse_caches:
+        for key in cache.keys():
+            if var == None or var in cache[key][1]:
+                del cache[key]
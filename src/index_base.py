@@ -0,0 +1,40 @@
+#
+# Matthew Epstein
+# index_base.py
+# This file is responsible for the base that list positions are counted from.
+# Indexing in p-scheme is date-based: the first element of a list is at
+# position (today), the number of the day of the year it is today.  Asking the
+# operating system for the date on every get, put, insert, and remove is
+# wasteful, so the day is worked out once and kept until midnight, when it is
+# worked out again.  The base can also be pinned to a fixed day (see the
+# --today option in pscm) so that a program behaves the same on every day it
+# is run.
+#
+
+
+import time
+
+pinned = None
+day = None
+next_midnight = 0
+
+
+# Returns the number day of the year it is today.  Jan 1 is 0; Dec 31 on a
+# non-leap year is 364.
+def today():
+    global day, next_midnight
+    if pinned != None:
+        return pinned
+    if time.time() >= next_midnight:
+        now = time.localtime()
+        day = now.tm_yday - 1
+        next_midnight = time.mktime((now.tm_year, now.tm_mon, now.tm_mday+1, \
+                                                           0, 0, 0, 0, 0, -1))
+    return day
+
+
+# Fixes the value today() returns to the given day, or lets it follow the
+# calendar again if day is None.
+def pin_today(new_day):
+    global pinned
+    pinned = new_day
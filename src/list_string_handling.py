@@ -9,7 +9,10 @@
 #
 
 import re
+import budget
 import global_vars
+import stats
+from pvector import *
 from type_checking import *
 
 
@@ -21,7 +24,8 @@ from type_checking import *
 # the parser would divide up a list of n elements into n different parts,
 # instead of interpreting it as a single entity.  The function returns either
 # the parsed expression if there is no error, or an integer value that
-# represents the type of error that was raised.
+# represents the type of error that was raised.  Each element of the parsed
+# expression has been classified by classify_token().
 def handleQuotesAndBrackets(origExp):
     toReturn = 0
 
@@ -94,7 +98,7 @@ def handleQuotesAndBrackets(origExp):
             temp = temp[(temp.find("\""))+1:]
             start = expression[i].find("\"", start)+1
 
-    return expression
+    return map(classify_token, expression)
 
 
 # Removes the information inside brackets from an expression
@@ -133,21 +137,28 @@ def getMatchingBracket(noQuotes):
 # If a list is hard-coded in as [1.0, 2.0, 3.0], for example, this function will
 # turn that list into [1, 2, 3]
 def int_float_handling(arg):
-    if float(arg) == int(float(arg)):
-         return int(float(arg))
-    else:
-        return float(arg)
+    num = native_num(arg)
+    if num == None:
+        raise ValueError("list element is not a finite number")
+    return num
 
 
 # Turns a string into a list.  I'm not entirely sure why the lstrip()s are
-# necessary, but sometimes leading spaces pop up unexpectedly.
+# necessary, but sometimes leading spaces pop up unexpectedly.  Lists that are
+# Values already hold their elements, so they do not need to be parsed.
 def string_to_list(string):
+    if stats.enabled:
+        stats.count("string_to_list.calls")
+    if isinstance(string, Value) and string.native != None:
+        return string.native.to_list()
     if string == "[]":
         return []
     elif type(string) == list:
         return string
     else:
         string = string[1:-1]
+    if stats.enabled:
+        stats.count("string_to_list.bytes", len(string) + 2)
 
     new_list = []
     noQuotes = re.sub('"[^"]*"', "\"\"", string)
@@ -189,20 +200,97 @@ def string_to_list(string):
     return new_list
 
 
-# Turns a list into a string.  Uses the stringify() function as a helper
-# function.
+# Turns a list into a string.  The elements are first put in the form that
+# string_to_list() would produce, so the resulting Value's elements are exactly
+# what parsing its string would give.
 def list_to_string(my_list):
-    if my_list == []:
-        return "[]"
-
-    new_string = "[" + stringify(my_list[0], "")
-    my_list = my_list[1:]
+    return vector_to_string(PVector(map(list_element, my_list)))
+
+
+# Turns a PVector (see pvector.py) whose elements are already in the form that
+# string_to_list() would produce into a list Value.  Every list that is turned
+# into a string is turned into one here, so this is where --stats counts
+# list_to_string() and where the length of lists is limited (see budget.py).
+# Every p-scheme value is a string, so the string is built here rather than
+# when the list is shown, and building it takes time linear in the length of
+# the list even when only one element has changed.
+def vector_to_string(vector):
+    if budget.enabled:
+        budget.check_list_length(len(vector))
+    string = "[" + ", ".join([stringify(x, "") for x in vector]) + "]"
+    if stats.enabled:
+        stats.count("list_to_string.calls")
+        stats.count("list_to_string.bytes", len(string))
+    return list_value(string, vector)
+
+
+# Updates the list a_list: vector is the PVector made by putting elem into
+# a_list (or by removing an element from it, if elem is None).  Returns the
+# new list as a Value, with any maybe in it turned into true or false.  Unless
+# a_list or elem has a maybe in it, the new list differs from a_list in only
+# one element, so whether it has literal elements and whether it is free of
+# maybes follows from a_list instead of having to be worked out again.
+def updated_list(a_list, vector, elem=None):
+    new_list = vector_to_string(vector)
+    if not isinstance(a_list, Value) or a_list.native == None or \
+       not maybe_free(a_list) or (isinstance(elem, str) and "maybe" in elem):
+        return handle_maybe(new_list)
+    new_list.maybe_free = True
+    new_list.literal_elements = literal_elements(a_list) and \
+                                            (elem == None or isLiteral(elem))
+    return new_list
 
-    for x in my_list:
-        new_string = new_string + ", " + stringify(x, "")
-    new_string += "]"
 
-    return new_string
+# The two functions below answer questions about a list Value that would
+# otherwise mean looking at every element: whether every element is a literal,
+# in which case list_check() can never find fault with it, and whether it has
+# no maybe in it, in which case handle_maybe() would leave it as it is.  The
+# answers are kept with the Value, since a list may be passed to many
+# primitives.
+def literal_elements(a_list):
+    try:
+        return a_list.literal_elements
+    except AttributeError:
+        a_list.literal_elements = a_list.native != None and \
+                                    all(isLiteral(x) for x in a_list.native)
+        return a_list.literal_elements
+
+def maybe_free(a_list):
+    try:
+        return a_list.maybe_free
+    except AttributeError:
+        a_list.maybe_free = "maybe" not in a_list
+        return a_list.maybe_free
+
+
+# Returns the elements of a list as a PVector.  Lists that are Values already
+# have one.
+def string_to_vector(string):
+    if isinstance(string, Value) and string.native != None:
+        return string.native
+    return PVector(string_to_list(string))
+
+
+# Puts a single element of a list in the form string_to_list() would produce:
+# lists become list Values and numbers are read back from their strings (eg.
+# 2.0 becomes 2).
+def list_element(elem):
+    if isinstance(elem, list):
+        return list_to_string(elem)
+    if isinstance(elem, float):
+        return normalize_num(elem)
+    if isinstance(elem, Value):
+        if elem.val_type == "num":
+            return int_float_handling(elem)
+        if elem.val_type == "list" and elem.native == None:
+            return list_to_string(string_to_list(elem))
+        return elem
+    if isinstance(elem, str):
+        if isNum(elem.lstrip()):
+            return int_float_handling(elem.lstrip())
+        if isList(elem.lstrip()):
+            return list_to_string(string_to_list(elem.lstrip()))
+    return elem
 
 
 # This function handles the potentially recursive nature of turning a list into
@@ -227,12 +315,16 @@ def stringify(elem, string):
 # If a list has a maybe value in it, this function turns that maybe into either
 # a true or false.
 def handle_maybe(string):
+    if isinstance(string, Value) and string.native != None and \
+                                                        maybe_free(string):
+        return string
     my_list = string_to_list(string)
     helper = lambda x: handle_maybe(x) if isList(x) else \
                                 x if not x=="maybe" else \
                                 "true" if randint(0,1)==0 else "false"
-    new_string = map(helper, my_list)
-    return list_to_string(new_string)
+    new_string = list_to_string(map(helper, my_list))
+    new_string.maybe_free = True
+    return new_string
 
 
 # If a list has a 7 value in it, this function returns an error.  If the list
@@ -268,14 +360,13 @@ def replace_sevens(string):
 
 
 # Ensures that all elements of a list are valid (eg. variables are defined,
-# types are correct, etc.)
+# types are correct, etc.), raising an EvalError if one is not
 def list_check(string, varEnv, locEnv):
+    if isinstance(string, Value) and literal_elements(string):
+        return
     list_arg = string_to_list(string)
     for i in list_arg:
-        (error, val) = \
-                general_type(str(i), [global_vars.ALL_TYPES], varEnv, locEnv)
-        if error != "" and error[0] == "error":
-            return error
+        general_type(str(i), [global_vars.ALL_TYPES], varEnv, locEnv)
 
 
 # Ensures a list that's hardcoded in is of the data-comma-space-data format
@@ -293,7 +384,7 @@ def string_check(string):
 
 
 # Ensures no element of a list is a literal (called in the function_check()
-# function in the pscm file).  If there are four quotes in the argument the
+# function in toplevel.py).  If there are four quotes in the argument the
 # format will be checked in the string pattern matching class.
 def var_check(a_list):
     isNon_numLiteral = lambda x: isBool(x) or \
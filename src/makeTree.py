@@ -10,14 +10,21 @@
 #
 
 
+import stats
 from node import *
 
 def makeTree(tree, funEnv, id_num, list_fun):
     val = tree.update_string()
     isRoot = tree.checkIfRoot()
     LIST_FUNCTIONS = ["fold", "map", "filter", "all", "exists"]
+    if stats.enabled:
+        stats.count("makeTree.nodes")
+        if isRoot:
+            stats.count("makeTree.trees")
 
-    if funEnv.inEnv(val) and not list_fun:
+    # literals were classified as Values by the tokenizer and can never be the
+    # name of a function
+    if not isinstance(val, Value) and funEnv.inEnv(val) and not list_fun:
         if val in LIST_FUNCTIONS:
             list_fun = True
         node = Node(val, funEnv.getArrity(val), isRoot, tree.update_num_nodes())
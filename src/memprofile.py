@@ -0,0 +1,150 @@
+#
+# Matthew Epstein
+# memprofile.py
+# Measures how much memory each top-level line of a program, and each
+# user-defined function, uses.  Profiling is off unless pscm is run with the
+# --memprofile option, in which case the results are written to standard
+# error, as text or as JSON, when the program exits.
+# The memory measured is the resident memory of the interpreter, which is
+# sampled whenever a line starts or ends and whenever a user-defined function
+# is called or returns.  For each line and each function, the profile gives
+# its peak (the most memory in use above what was in use when it started) and
+# the memory it retained (how much more was in use when it ended than when it
+# started), in KiB.  A function's figures include the functions it calls, and
+# a function that calls itself is only counted once per outermost call (and is
+# not listed among its own callees).  Where the memory was allocated cannot be
+# known without tracemalloc, which this version of python does not have, so
+# the profile instead names, for each line and function, the functions called
+# directly from it that retained the most memory.  Lines are listed in the
+# order of the file and functions in alphabetical order, so that two profiles
+# can be compared with diff.
+# Of the other p-scheme files, this file "includes" only output.py.
+#
+
+
+import atexit
+import json
+import sys
+import output
+
+FORMATS = ["text", "json"]
+TOP_CALLEES = 3 # number of callees listed for each line and function
+
+enabled = False
+report_format = "text"
+lines = dict() # maps (first line, last line) to the figures for that line
+functions = dict() # maps a function's name to its figures
+open_regions = [] # the line and function calls in progress, outermost first
+
+
+# Turns profiling on.  The profile is reported in the given format (one of
+# FORMATS) when the program exits.  Raises an ImportError if the memory of the
+# interpreter cannot be measured on this system.
+def enable(new_format):
+    global enabled, report_format
+    import resource
+    enabled = True
+    report_format = new_format
+    atexit.register(report)
+
+
+# Starts the top-level expression that spans the given lines.  Anything still
+# in progress (eg. the function calls of a line that failed a check-error) is
+# ended first.
+def start_line(first, last):
+    end_line()
+    __start(("line", (first, last)))
+
+
+# Ends every line and function call in progress.
+def end_line():
+    while open_regions != []:
+        __end()
+
+
+def start_function(name):
+    __start(("function", name))
+
+
+def end_function():
+    if open_regions != [] and open_regions[-1][0][0] == "function":
+        __end()
+
+
+# Writes the profile to standard error, after anything the program has printed.
+def report():
+    end_line()
+    output.flush()
+    if report_format == "json":
+        profile = {"lines": [dict(figures, first_line=first, last_line=last) \
+                         for ((first, last), figures) in sorted(lines.items())],
+                   "functions": functions}
+        sys.stderr.write(json.dumps(profile, sort_keys=True, indent=2, \
+                                            separators=(",", ": ")) + "\n")
+        return
+    sys.stderr.write("Memory profile (KiB):\n")
+    for ((first, last), figures) in sorted(lines.items()):
+        label = "line {}".format(first) if first == last \
+                                        else "lines {}-{}".format(first, last)
+        __write_figures(label, figures)
+    for name in sorted(functions):
+        __write_figures("function " + name, functions[name])
+
+
+# Returns the resident memory of the interpreter in KiB.  Where /proc is not
+# available, the most memory the interpreter has ever used is the closest
+# measure there is.  (Also used by budget.py.)
+def resident():
+    import resource
+    try:
+        with open("/proc/self/statm") as statm:
+            pages = int(statm.read().split()[1])
+        return pages * resource.getpagesize() // 1024
+    except (IOError, IndexError, ValueError):
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak // 1024 if sys.platform == "darwin" else peak
+
+
+# The two functions below start and end a line or function call.  Each region
+# in progress is a list of [key, memory at the start, peak memory so far, the
+# memory retained by each function called directly from it].
+def __start(key):
+    now = __sample()
+    open_regions.append([key, now, now, dict()])
+
+
+def __end():
+    now = __sample()
+    ((kind, name), start, peak, callees) = open_regions.pop()
+    table = lines if kind == "line" else functions
+    if name not in table:
+        table[name] = {"calls": 0, "peak": 0, "retained": 0, "callees": {}}
+    figures = table[name]
+    figures["calls"] += 1
+    figures["peak"] = max(figures["peak"], peak - start)
+    for (callee, retained) in callees.items():
+        figures["callees"][callee] = \
+                                figures["callees"].get(callee, 0) + retained
+    if (kind, name) not in [region[0] for region in open_regions]:
+        figures["retained"] += now - start
+    if kind == "function" and open_regions != [] and \
+                                        open_regions[-1][0] != (kind, name):
+        parent_callees = open_regions[-1][3]
+        parent_callees[name] = parent_callees.get(name, 0) + now - start
+
+
+# Measures the memory in use and updates the peak of everything in progress.
+def __sample():
+    now = resident()
+    for region in open_regions:
+        region[2] = max(region[2], now)
+    return now
+
+
+def __write_figures(label, figures):
+    sys.stderr.write("{:<30} calls {:>8}  peak {:>8}  retained {:>8}\n"\
+       .format(label, figures["calls"], figures["peak"], figures["retained"]))
+    callees = sorted(figures["callees"].items(), key=lambda x: (-x[1], x[0]))
+    for (callee, retained) in callees[:TOP_CALLEES]:
+        sys.stderr.write("    {:<26} retained {:>8}\n".format(\
+                                                "from " + callee, retained))
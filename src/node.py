@@ -10,14 +10,32 @@
 #
 
 import sys
+import budget
 import global_vars
+import stats
 from define_primitive import *
 from list_string_handling import *
 from type_checking import *
 
 
 
-class Node:
+class Node(object):
+    # A tree is made up of one node per function, variable, and literal in the
+    # expression, so nodes use slots rather than a dictionary of attributes.
+    # Once a tree has been built, checked, and folded, nothing about it changes
+    # while it is evaluated: the results of the children of a node are kept by
+    # evaluate() itself and the results shared by identical subtrees are kept
+    # in a cache that belongs to the evaluation (see evaluateTree()).  A tree
+    # can therefore be evaluated any number of times, including by a function
+    # that calls itself while the tree is being evaluated.
+    # Each node that calls a function also remembers what that function
+    # resolved to the last time the node was evaluated (an inline cache; see
+    # __resolve()).
+    __slots__ = ("val", "numChildren", "children", "root", "id_num", \
+                 "cse_key", "cse_vars", "cse_marked", "result", \
+                 "cache_env", "cache_version", "cache_primitive", \
+                 "cache_clauses", "cache_handler")
+
     # Initializes the class.  For functions, numChildren will be equal to the
     # arrity of that function while for variables and literals, numChildren will
     # equal to -1.
@@ -27,10 +45,19 @@ class Node:
         self.children = [None] * self.numChildren #[None]*-1 = []
         self.root = root # will be a boolean value
         self.id_num = id_num
+        self.cse_key = None # set for subtrees that appear more than once
+        self.cse_vars = None
+        self.cse_marked = False # only used by the root
+        # result is the value of a literal or variable; it is None for functions
         if numChildren == -1:
             self.result = val
         else:
             self.result = None
+        self.cache_env = None # the function environment the cache is for
+        self.cache_version = None
+        self.cache_primitive = None
+        self.cache_clauses = None
+        self.cache_handler = None
 
     # The four functions below are all fairly self-explanatory.
     def getChild(self, i):
@@ -55,54 +82,112 @@ class Node:
     # A consequence of this method is that if there is an error in the garbage
     # part of the conditional or loop, the evaluator will not find it (although
     # this is not necessarily a bad thing).  This function also calls the
-    # __pattern_matching() function.
+    # __pattern_matching() function.  It returns the node's value, and raises
+    # an EvalError (see values.py) if evaluating the subtree fails.
     def evaluate(self, varEnv, funEnv, locEnv):
+        if budget.enabled:
+            budget.step()
+        if self.cse_key != None and \
+                                self.cse_key in global_vars.cse_caches[-1]:
+            return global_vars.cse_caches[-1][self.cse_key][0]
+
         checks = ["check-error", "check-expect"]
         if self.val in checks and global_vars.user_function > 0:
-            return ("error", "Error: Can't check within a function")
+            raise EvalError("Error: Can't check within a function")
 
         if self.root and self.val != None and self.numChildren == -1:
             val_list = definePrimitive([self.val], [[global_vars.ALL_TYPES]], \
                                                             varEnv, locEnv[-1])
-            if val_list[0] == "error":
-                return val_list
-            return ("not_error", str(val_list[0]))
+            return to_value(val_list[0])
 
         if self.numChildren != -1:
             conds_and_loops = ["if", "ifTrue", "ifFalse", "while", "for"]
             if self.val not in conds_and_loops:
-                for i in range(self.numChildren):
-                    self.children[i].result = \
-                            (self.children[i]).evaluate(varEnv, funEnv, locEnv)
-                #self.children = [(a,b) for (a,b) in self.children if b != None]
-                for i in range(len(self.children)):
-                    if self.children[i].result[0] == "not_error":
-                        self.children[i].result = self.children[i].result[1]
-                    else:
-                        return self.children[i].result
+                args = [child.evaluate(varEnv, funEnv, locEnv) \
+                                                    for child in self.children]
+            else:
+                args = [child.result for child in self.children]
         else:
-            return ("not_error", self.val)
+            return self.val
 
-        args = reduce(lambda acc, x: acc+[x.result], self.children, [])
         args = filter(lambda x: x != None, args)
 
-        if self.val not in global_vars.PRIMITIVES:
+        if self.cache_env is not funEnv or \
+                                    self.cache_version != funEnv.version:
+            self.__resolve(funEnv)
+        if not self.cache_primitive:
             global_vars.curr_function.append(self.val)
 
-        if funEnv.getNumFuncs(self.val) == 1:
-            (fun, op) = funEnv.getVal(self.val, "function")[:2]
+        if self.cache_clauses == 1:
+            (fun, op) = self.cache_handler
             try:
-                (error, val) = fun(args, varEnv, locEnv, funEnv, op, self.id_num)
+                result = to_value(fun(args, varEnv, locEnv, funEnv, op, self))
             # otherwise when the user uses the exit() function the "Recursion 
             # too deep" error will print
             except SystemExit:
                 exit(0)
+            except EvalError:
+                raise
             except:
-                return ("error", "Error: Recursion too deep")
+                raise EvalError("Error: Recursion too deep")
+            if budget.enabled:
+                budget.check(result)
         else:
-            return self.__pattern_matching(funEnv, varEnv, locEnv, args)
-
-        return (error, str(val))
+            result = self.__pattern_matching(funEnv, varEnv, locEnv, args)
+            if budget.enabled:
+                budget.check(result)
+            return result
+
+        if self.cse_key != None and self.__shareable(varEnv, locEnv):
+            global_vars.cse_caches[-1][self.cse_key] = (result, self.cse_vars)
+        return result
+
+
+    # Returns True if the result of this node may be shared with the identical
+    # subtrees marked by markCommonSubtrees().  It may not be if any variable
+    # the subtree depends on is bound to a value with a maybe in it, or to
+    # values of more than one type, since the subtree may then produce a
+    # different value each time it is evaluated.
+    def __shareable(self, varEnv, locEnv):
+        for var in self.cse_vars:
+            bindings = locEnv[-1].env.get(var) or varEnv.env.get(var) or []
+            if len(bindings) > 1:
+                return False
+            for (val, valType) in bindings:
+                if isinstance(val, str) and "maybe" in val:
+                    return False
+        return True
+
+
+    # Evaluates the tree of which this node is the root.  Identical subtrees
+    # marked by markCommonSubtrees() share their results for the duration of
+    # the evaluation, through a cache that is made for this evaluation alone.
+    # userFun() (see primitives.py) does the same inline, which saves a
+    # Python frame for each call of a user-defined function.
+    def evaluateTree(self, varEnv, funEnv, locEnv):
+        if not self.cse_marked:
+            return self.evaluate(varEnv, funEnv, locEnv)
+        global_vars.cse_caches.append(dict())
+        try:
+            return self.evaluate(varEnv, funEnv, locEnv)
+        finally:
+            global_vars.cse_caches.pop()
+
+
+    # Looks up the function this node calls and remembers whether it is a
+    # primitive, how many clauses (patterns) it has, and, if it has only one,
+    # the function and operation that carry it out.  What is remembered stays
+    # good until a binding in the function environment is added or changed,
+    # which is when the environment's version goes up.
+    def __resolve(self, funEnv):
+        self.cache_env = funEnv
+        self.cache_version = funEnv.version
+        self.cache_primitive = self.val in global_vars.PRIMITIVES
+        self.cache_clauses = funEnv.getNumFuncs(self.val)
+        if self.cache_clauses == 1:
+            self.cache_handler = tuple(funEnv.getVal(self.val, "function")[:2])
+        else:
+            self.cache_handler = None
 
 
     # This function serves as a helper function for the evaluate() function.  It
@@ -114,32 +199,33 @@ class Node:
         vals = []
         for i in range(len(args)):
             literal_type = get_pattern_type(self.val, funEnv, i)
-            (result, constraint) = \
+            (val, constraint) = \
               general_type(args[i], [[literal_type[1]]], varEnv, locEnv[-1])
-            if result[0] == "error":
-                return result
-            (error, val) = ("not_error", result)
             if not isLiteral(val):
                 val = getValofType(val, constraint, varEnv, locEnv[-1])
             if isString(val) and len(val) > 52 and \
                                     val[0] == "\"" and val[-1] == "\"":
-                return ("error", "Error: String is too long to match against")
+                raise EvalError("Error: String is too long to match against")
             vals.append(val)
 
         vals = map(lambda x: x if x!="maybe" else "true" \
                                     if randint(0,1)==0 else "false", vals)
         for i in range(funEnv.getNumFuncs(self.val)):
+            if stats.enabled:
+                stats.count("pattern_match.{}.clause{}".format(self.val, i+1))
             if reduce(lambda acc, x: \
                     (funEnv.getPM(self.val)).matches(x, i) and acc, vals, True):
                 (fun, body) = funEnv.getFunc(self.val)[i][0][:2]
                 try:
-                    return fun(args, varEnv, locEnv, funEnv, body, self.id_num, i)
-                except SystemExit: # see comment in lines 96-97
+                    return fun(args, varEnv, locEnv, funEnv, body, self, i)
+                except SystemExit: # see the comment in evaluate()
                     exit(0)
+                except EvalError:
+                    raise
                 except:
-                    return ("error", "Error: Recursion too deep")
+                    raise EvalError("Error: Recursion too deep")
             if i == funEnv.getNumFuncs(self.val)-1:
-                return ("error", "Error: Input matches no patterns")
+                raise EvalError("Error: Input matches no patterns")
 
 
     # Detailing exactly how this algorithm works would be far too complicated,
@@ -174,8 +260,14 @@ class Node:
     # Obviously, this is incorrect.  Evaluating the above tree will result in an
     # "Incorrect number of arguments" error--not 2.  The algorithm below is
     # capable of recognizing when a tree is incorrectly formatted and will
-    # correctly rebalance it.
-    def epsteinCheck(self, varEnv, funEnv, tree, locEnv):
+    # correctly rebalance it.  depth is how deeply the function has called
+    # itself, which is only kept track of for --stats.
+    def epsteinCheck(self, varEnv, funEnv, tree, locEnv, depth=0):
+        if stats.enabled:
+            stats.count("epsteinCheck.calls")
+            stats.record_max("epsteinCheck.max_depth", depth)
+            if depth == 0:
+                stats.count("epsteinCheck.passes")
         if tree.getNoneCount() == 0:
             return
         none_check = lambda x: x.val==None
@@ -211,13 +303,14 @@ class Node:
                 return
         elif self.numChildren != -1:
             for i in range(self.numChildren):
-                self.children[i].epsteinCheck(varEnv, funEnv, tree, locEnv)
+                self.children[i].epsteinCheck(varEnv, funEnv, tree, locEnv, \
+                                                                      depth+1)
             return
             if self.root:
                 return
         else: # node value is a variable/literal
             return
-        return self.epsteinCheck(varEnv, funEnv, tree, locEnv)
+        return self.epsteinCheck(varEnv, funEnv, tree, locEnv, depth+1)
 
 
     # This is a private helper function to epsteinCheck()
@@ -282,42 +375,132 @@ class Node:
 
 
     # This function ensures that the number 7 is not at the leaf-level of a tree
-    # either as a number or as an element in a list.  The function returns True
-    # if the number 7 is present and False otherwise.  It also ensures that
-    # there are no top-level functions in a node other than at the root of the
-    # tree. 
+    # either as a number or as an element in a list.  The function raises an
+    # EvalError if the number 7 is present.  It also ensures that there are no
+    # top-level functions in a node other than at the root of the tree.
     def seven_and_checkCheck (self):
         top_level_functions = ["check-error", "check-expect", "define", "done"]
         if not self.root and self.val in top_level_functions:
             global_vars.check_error = False
             global_vars.check_expect = False
-            return ("error", "Error: Function is top-level")
+            raise EvalError("Error: Function is top-level")
 
         if self.numChildren != -1:
             for i in range(self.numChildren):
-                result = self.children[i].seven_and_checkCheck()
-                if result[0] == "error":
-                    return result
+                self.children[i].seven_and_checkCheck()
+        elif isinstance(self.val, Value) and self.val.val_type == "num":
+            if int(self.val.native) == 7:
+                raise EvalError("Error: Argument is 7")
         elif isNum(self.val) and int(float(self.val)) == 7:
-            return ("error", "Error: Argument is 7")
+            raise EvalError("Error: Argument is 7")
         if isList(self.val):
             result = handle_seven(self.val)
             if result == ("error", "Error: Argument is 7"):
-                return result
+                raise EvalError(result[1])
+            elif isinstance(result, Value):
+                # the list may still name variables, so it stays a token
+                self.val = Token(result, "list")
             else:
                 self.val = result
 
-        return ("not_error", "all good")
 
+    # Replaces every subtree that is made up only of literals and primitives in
+    # global_vars.PURE_PRIMITIVES with the literal it evaluates to, so that the
+    # subtree does not have to be evaluated again each time a function body
+    # or loop body runs.  It is called once, when the tree of an expression in
+    # a function body is first built, and on a top-level expression only if
+    # it contains a loop (see containsLoop()), since otherwise the expression
+    # runs only once.  The function returns True if the node is (or has
+    # become) a literal.  A subtree that produces an error is left alone so
+    # that the error is raised when, and only if, the subtree is actually
+    # evaluated.  The root is never folded, and this function should only be
+    # called after seven_and_checkCheck(), since a folded subtree may well
+    # evaluate to 7.
+    def foldConstants(self, varEnv, funEnv, locEnv):
+        if self.numChildren == -1:
+            return isinstance(self.val, Value) and self.val != "maybe"
+
+        foldable = True
+        for i in range(self.numChildren):
+            if not self.children[i].foldConstants(varEnv, funEnv, locEnv):
+                foldable = False
+        if not foldable or self.root or \
+                                self.val not in global_vars.PURE_PRIMITIVES:
+            return False
+
+        try:
+            val = self.evaluate(varEnv, funEnv, locEnv)
+        except EvalError:
+            return False
+        self.val = val
+        self.numChildren = -1
+        self.children = []
+        self.result = val
+        return True
+
+
+    # Returns True if the tree of which this node is the root contains a while
+    # or for loop, whose body is evaluated again on every iteration.
+    def containsLoop(self):
+        if self.numChildren == -1:
+            return False
+        if self.val in ["while", "for"]:
+            return True
+        for child in self.children:
+            if child.containsLoop():
+                return True
+        return False
 
-    # Returns the node with the specified ID number
-    def get_node(self, desired_id):
-        if self.id_num == desired_id:
-            return self
 
+    # Real code often repeats a subtree within a single expression (eg. the
+    # (board (i today +) get) in examples/snake.pscm).  This function, which
+    # should be called on the root of a tree, finds every subtree that is made
+    # up only of literals, variables, and primitives in
+    # global_vars.CACHEABLE_PRIMITIVES and that appears more than once in the
+    # tree.  Such subtrees are marked so that, while the tree is being
+    # evaluated by evaluateTree(), only the first copy is evaluated and the
+    # others reuse its result.  A result is thrown away as soon as one of the
+    # variables it depends on is bound again (see global_vars.invalidate_cse()).
+    def markCommonSubtrees(self):
+        counts = dict()
+        subtrees = []
+        self.__subtreeKey(counts, subtrees)
+
+        for (node, key, variables) in subtrees:
+            if counts[key] > 1:
+                node.cse_key = key
+                node.cse_vars = variables
+                self.cse_marked = True
+
+
+    # This is a private helper function to markCommonSubtrees().  It returns a
+    # key that is identical for identical subtrees, the variables the subtree
+    # depends on, and whether or not the subtree's result can be shared.
+    def __subtreeKey(self, counts, subtrees):
+        if self.numChildren == -1:
+            if isinstance(self.val, Value):
+                return (str(self.val), frozenset(), "maybe" not in self.val)
+            if isinstance(self.val, Token) and self.val.kind == "function":
+                return (str(self.val), frozenset([self.val[2:]]), True)
+            if isinstance(self.val, Token) and self.val.kind != "list":
+                return (str(self.val), frozenset([self.val.parts[0]]), True)
+            return (None, frozenset(), False)
+
+        cacheable = self.val in global_vars.CACHEABLE_PRIMITIVES
+        keys = []
+        variables = frozenset()
         for i in range(self.numChildren):
-            if (self.children[i]).get_node(desired_id) != None:
-                return (self.children[i]).get_node(desired_id)
+            (key, child_vars, child_cacheable) = \
+                            self.children[i].__subtreeKey(counts, subtrees)
+            keys.append(key)
+            variables = variables | child_vars
+            cacheable = cacheable and child_cacheable
+
+        key = (self.val, tuple(keys))
+        if cacheable and self.numChildren > 0:
+            counts[key] = counts.get(key, 0) + 1
+            subtrees.append((self, key, variables))
+        return (key, variables, cacheable)
 
 
     # For testing purposes only
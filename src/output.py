@@ -0,0 +1,66 @@
+#
+# Matthew Epstein
+# output.py
+# Everything a p-scheme program prints (with print, write, and clear_screen)
+# goes through the buffer in this file rather than straight to the screen.
+# Programs that draw a board one row at a time make many small writes, and
+# sending each one to the terminal separately is slow.  The buffer is emptied
+# onto the screen when it grows past THRESHOLD characters, before the program
+# waits for input (see getch.py) or for time to pass (see frames.py), before
+# an error is printed, and when the program exits.  In "line" mode (the
+# default) it is also emptied at the end of every line, so output appears just
+# as it would without the buffer.  In "full" mode it is not, which is faster
+# for programs that print a lot at once (see the --buffer option in pscm).
+# The buffer is emptied onto standard output unless it has been given another
+# stream to empty onto (see embed.py).
+# Like global_vars.py, this file "includes" no other p-scheme file.
+#
+
+
+import atexit
+import sys
+
+THRESHOLD = 8192
+MODES = ["line", "full"]
+
+mode = "line"
+stream = None # where the buffer is emptied; None for standard output
+buffered = []
+size = 0
+
+
+# Adds text to the buffer, emptying the buffer if necessary.
+def write(text):
+    global size
+    buffered.append(text)
+    size += len(text)
+    if size >= THRESHOLD or (mode == "line" and "\n" in text):
+        flush()
+
+
+# Empties the buffer onto the screen (or the stream it has been given).
+def flush():
+    global buffered, size
+    out = sys.stdout if stream == None else stream
+    if buffered != []:
+        out.write("".join(buffered))
+        buffered = []
+        size = 0
+    out.flush()
+
+
+def set_mode(new_mode):
+    global mode
+    mode = new_mode
+
+
+# Empties the buffer and sends everything written from now on to new_stream
+# (a file or anything else with write() and flush()), or to standard output if
+# new_stream is None.
+def set_stream(new_stream):
+    global stream
+    flush()
+    stream = new_stream
+
+
+atexit.register(flush)
@@ -156,18 +156,18 @@ class PM_Nums:
 
         if "=" in val[0] and "=" in op:
             if "<" in op:
-                if float(val[1]) > float(bound):
+                if native_num(val[1]) > native_num(bound):
                     return ("error", "Error: Bad Pattern")
             else:
-                if float(val[1]) < float(bound):
+                if native_num(val[1]) < native_num(bound):
                     return ("error", "Error: Bad Pattern")
             return ("not_error", ([val[0], op], [val[1], bound]))
         else:
             if "<" in op:
-                if float(val[1]) >= float(bound):
+                if native_num(val[1]) >= native_num(bound):
                     return ("error", "Error: Bad Pattern")
             else:
-                if float(val[1]) <= float(bound):
+                if native_num(val[1]) <= native_num(bound):
                     return ("error", "Error: Bad Pattern")
             return ("not_error", ([op, val[0]], [bound, val[1]]))
 
@@ -175,8 +175,8 @@ class PM_Nums:
     # This funciton updates self.interval and self.patterns.  It will return an
     # error if pattern matching proves to be over-exhaustive.
     def __add_helper(self, lbound, ubound, lbound_ie, ubound_ie, nequal=False):
-        lbound = float(lbound)
-        ubound = float(ubound)
+        lbound = native_num(lbound)
+        ubound = native_num(ubound)
 
         if lbound > ubound:
             (lbound, ubound) = (ubound, lbound)
@@ -211,7 +211,7 @@ class PM_Nums:
     # Returns True if arg is contained in the i-th pattern and False otherwise.
     # arg will always be a number.
     def matches(self, arg, i):
-        return (self.patterns[i]).inInterval(float(arg))
+        return (self.patterns[i]).inInterval(native_num(arg))
 
 
 
@@ -7,7 +7,8 @@
 # upon the definePrimitive() function in define_primitive.py.  (The function is
 # not in this file because node.py uses it as well, but since this file
 # "includes" node.py, node.py would not have access to the function if it were
-# here.)
+# here.)  Each function returns the value it produces and raises an EvalError
+# (see values.py) if it fails.
 #
 # It is also worth explaining how the type system works.  Each function has a
 # type, which states the what types the arguments for that function must be as
@@ -42,9 +43,15 @@
 
 import itertools
 import math
+import budget
 import global_vars
+import memprofile
+import output
+import snapshot
+import stats
 from define_primitive import *
 from expTree import *
+from index_base import *
 from node import *
 from env import *
 from type_checking import *
@@ -56,15 +63,11 @@ from makeTree import *
 # Checks to make sure the result of a conditional or a loop (both of which 
 # evaluate subtrees) can be translated into a value.
 def verifyResult(val, varEnv, locEnv):
-    if val[0] != "not_error":
-        return val
     constraints = [[global_vars.ALL_TYPES]]
-    val_list = definePrimitive([val[1]], constraints, varEnv, locEnv[-1])
-    if val_list[0] == "error":
-        return val_list
+    val_list = definePrimitive([val], constraints, varEnv, locEnv[-1])
     val_list = map(lambda x: x if not isinstance(x, bool) else "true" \
                                             if x else "false", val_list)
-    return ("not_error", val_list[0])
+    return val_list[0]
 
 
 # This function takes in an argument and verifies that the argument is a
@@ -72,57 +75,61 @@ def verifyResult(val, varEnv, locEnv):
 # argument
 def valid_function_check(arg, varEnv, locEnv, funEnv):
     if isLiteral(arg):
-        return ("error", "Error: Bad type")
+        raise EvalError("Error: Bad type")
     if not funEnv.inEnv(arg):
         if not varEnv.inEnv(arg) and not locEnv.inEnv(arg):
-            return ("error", "Error: Argument does not exist")
+            raise EvalError("Error: Argument does not exist")
         else:
-            return ("error", "Error: Bad type")
-    return ("not_error", arg)
+            raise EvalError("Error: Bad type")
+    return arg
 
 # Function called when both arguments must be numbers.
-def numArrityTwo(args, varEnv, locEnv, funEnv, op, id_num):
+def numArrityTwo(args, varEnv, locEnv, funEnv, op, node):
     constraints = [[["num"]], [["num"]]]
     val_list = definePrimitive(args, constraints, varEnv, locEnv[-1])
-    if val_list[0] == "error":
-        return val_list
     try:
         result = op(val_list[0], val_list[1])
-        if op == operator.div:
-            result = op(float(val_list[0]), float(val_list[1]))
-        if not isinstance(result, list): #range returns a list
+        # whole numbers that divide evenly stay exact, however large they are
+        if op == operator.div and val_list[1] != 0 and \
+           all(isinstance(x, (int, long)) for x in val_list) and \
+                                            val_list[0] % val_list[1] == 0:
+            result = val_list[0] // val_list[1]
+        elif op == operator.div:
+            result = operator.truediv(val_list[0], val_list[1])
+        # range returns a list (or an xrange when in a for loop)
+        if not isinstance(result, (list, xrange)):
             if int(result) == result:
                 result = int(result)
-        return ("not_error", result)
+        return result
+    except OverflowError:
+        raise EvalError("Error: To infinity and beyond")
+    except EvalError:
+        raise
     except:
         if op == randint:
             if val_list[0] > val_list[1]:
-                return ("error", "Error: Argument out of range")
+                raise EvalError("Error: Argument out of range")
             else:
-                return ("error", "Error: Arguments must be integers")    
+                raise EvalError("Error: Arguments must be integers")
         elif op == operator.div or op == operator.mod:
-            return ("error", "Error: Cannot divide or modulo by 0")
+            raise EvalError("Error: Cannot divide or modulo by 0")
         else:
-            return ("error", "Error: Argument must be an integer")
+            raise EvalError("Error: Argument must be an integer")
 
 # String concatenation
-def concat(args, varEnv, locEnv, funEnv, op, id_num):
+def concat(args, varEnv, locEnv, funEnv, op, node):
     constraints = [[["str"]], [["str"]]]
     val_list = definePrimitive(args, constraints, varEnv, locEnv[-1])
-    if val_list[0] == "error":
-        return val_list
     for i in range(len(val_list)):
         if isString(val_list[i]):
             val_list[i] = val_list[i][1:-1]
-    return ("not_error", "\""+op(val_list[0], val_list[1])+"\"")
+    return str_value("\""+op(val_list[0], val_list[1])+"\"")
 
 
 # Function called when both arguments must be numbers.
-def numArrityOne(args, varEnv, locEnv, funEnv, op, id_num):
+def numArrityOne(args, varEnv, locEnv, funEnv, op, node):
     constraints = [[["num"]]]
     val_list = definePrimitive(args, constraints, varEnv, locEnv[-1])
-    if val_list[0] == "error":
-        return val_list
 
     # ! will raise an error if arg is non-integral or negative
     # v/ will raise an error if arg is negative
@@ -133,61 +140,53 @@ def numArrityOne(args, varEnv, locEnv, funEnv, op, id_num):
             result = op(val_list[0])
             if int(result) == result:
                 result = int(result)
-            return ("not_error", result)
-        return ("not_error", op(val_list[0]))
+            return result
+        return op(val_list[0])
+    except EvalError:
+        raise
     except:
-        return ("error", "Error: Argument out of range")
+        raise EvalError("Error: Argument out of range")
 
 
 # eg. and, or, xor, etc.
-def booleans(args, varEnv, locEnv, funEnv, op, id_num):
+def booleans(args, varEnv, locEnv, funEnv, op, node):
     constraints = [[["bool"]], [["bool"]]]
     val_list = definePrimitive(args, constraints, varEnv, locEnv[-1])
-    if val_list[0] == "error":
-        return val_list
-    return ("not_error", "true" if op(val_list[0], val_list[1]) else "false")
+    return bool_value(op(val_list[0], val_list[1]))
 
 # The not function
-def boolNot(args, varEnv, locEnv, funEnv, op, id_num):
+def boolNot(args, varEnv, locEnv, funEnv, op, node):
     constraints = [[["bool"]]]
     val_list = definePrimitive(args, constraints, varEnv, locEnv[-1])
-    if val_list[0] == "error":
-        return val_list
-    return ("not_error", "true" if op(val_list[0]) else "false")
+    return bool_value(op(val_list[0]))
 
 # eg. <. <=, =>, >
 # Both numbers and strings (think alphabetical sorting) can be compared to each
 # other
-def comparison(args, varEnv, locEnv, funEnv, op, id_num):
+def comparison(args, varEnv, locEnv, funEnv, op, node):
     constB = [["num", "str"]]
     constA = constB
     constraints = [constA, constB] #link the arguments
     val_list = definePrimitive(args, constraints, varEnv, locEnv[-1])
-    if val_list[0] == "error":
-        return val_list
-    return ("not_error", "true" if op(val_list[0], val_list[1]) else "false")
+    return bool_value(op(val_list[0], val_list[1]))
 
 
 # = and <>
-def equal_nequal(args, varEnv, locEnv, funEnv, op, id_num):
+def equal_nequal(args, varEnv, locEnv, funEnv, op, node):
     constB = [global_vars.ALL_TYPES]
     constA = constB
     constraints = [constA, constB]
 
     val_list = definePrimitive(args, constraints, varEnv, locEnv[-1])
-    if val_list[0] == "error":
-        return val_list
 
-    return ("not_error", "true" if op(val_list[0], val_list[1]) else "false")
+    return bool_value(op(val_list[0], val_list[1]))
 
 
 # Printing (prints with a new line character at the end) and writing (no new
 # line character)
-def printVar(args, varEnv, locEnv, funEnv, op, id_num):
+def printVar(args, varEnv, locEnv, funEnv, op, node):
     constraints = [[global_vars.ALL_TYPES]]
     val_list = definePrimitive(args, constraints, varEnv, locEnv[-1])
-    if val_list[0] == "error":
-        return val_list
 
     if isinstance(val_list[0], bool):
         if val_list[0]:
@@ -200,16 +199,14 @@ def printVar(args, varEnv, locEnv, funEnv, op, id_num):
         op(val_list[0])
     else:
         op(val_list[0])
-    return ("not_error", "Nothing")
+    return "Nothing"
 
 # The user is prompted to enter input.  The input can either be a number or a
 # string but there is obviously no reason the user should know about the
 # representations of booleans, lists, or nonetype objects.
-def userInput(args, varEnv, locEnv, funEnv, op, id_num):
+def userInput(args, varEnv, locEnv, funEnv, op, node):
     constraints = [[global_vars.ALL_TYPES]]
     val_list = definePrimitive(args, constraints, varEnv, locEnv[-1])
-    if val_list[0] == "error":
-        return val_list
 
     if isinstance(val_list[0], bool):
         if val_list[0]:
@@ -222,32 +219,49 @@ def userInput(args, varEnv, locEnv, funEnv, op, id_num):
     input_val = op(val_list[0])
     if not isNum(input_val):
         input_val = "\"" + input_val + "\""
-    return ("not_error", input_val)
+    return input_val
 
 
 # Functions that take in no arguments.
-def arrityZero(args, varEnv, locEnv, funEnv, op, id_num):
+def arrityZero(args, varEnv, locEnv, funEnv, op, node):
     if args != []:
-        return ("error", "Error: Incorrect number of arguments")
-    return ("not_error", op())
+        raise EvalError("Error: Incorrect number of arguments")
+    return op()
 
 
 # Similar to the userInput() function, except the user may only enter a single
 # character. 
-def getChar(args, varEnv, locEnv, funEnv, op, id_num):
+def getChar(args, varEnv, locEnv, funEnv, op, node):
     if args != []:
-        return ("error", "Error: Incorrect number of arguments")
+        raise EvalError("Error: Incorrect number of arguments")
     val = op()
     if isNum(val):
-        return ("not_error", int(val))
+        return int(val)
     else:
-        return ("not_error", "\""+val+"\"")
+        return "\""+val+"\""
+
+
+# Similar to the getChar() function, except that it only waits the specified
+# number of seconds for a character to be typed.  Returns Nothing if none is.
+def getCharTimeout(args, varEnv, locEnv, funEnv, op, node):
+    constraints = [[["num"]]]
+    val_list = definePrimitive(args, constraints, varEnv, locEnv[-1])
+    if val_list[0] < 0:
+        raise EvalError("Error: Argument out of range")
+
+    val = op(val_list[0])
+    if val == None:
+        return "Nothing"
+    if isNum(val):
+        return int(val)
+    else:
+        return "\""+val+"\""
 
 
 # Simply prints an encouraging message to the user.
-def happy(args, varEnv, locEnv, funEnv, op, id_num):
+def happy(args, varEnv, locEnv, funEnv, op, node):
     if args != []:
-        return ("error", "Error: Incorrect number of arguments")
+        raise EvalError("Error: Incorrect number of arguments")
     compliments = ["You're doing great!", "You can do it!", "Don't stop now!", \
                    "This is really great code!", "You're a smart cookie!", \
                    "Keep up the good work!", "You're perfect!", \
@@ -271,132 +285,122 @@ def happy(args, varEnv, locEnv, funEnv, op, id_num):
                    "The world needs more people like you in it!", \
                    "You deserve love and happiness.", "You have the best ideas!", \
                    "You have a gift for making people comfortable."]
-    print compliments[randint(0,29)]
-    return ("not_error", "Nothing")
+    output.write(compliments[randint(0,29)] + "\n")
+    return "Nothing"
 
 
 # Functions that take in a single list (eg. length() and null?)
-def listArrityOne(args, varEnv, locEnv, funEnv, op, id_num):
+def listArrityOne(args, varEnv, locEnv, funEnv, op, node):
     constraints = [[["list"]]]
     val_list = definePrimitive(args, constraints, varEnv, locEnv[-1])
-    if val_list[0] == "error":
-        return val_list
 
-    val_list[0] = string_to_list(val_list[0])
-    return ("not_error", op(val_list[0]))
+    val_list[0] = string_to_vector(val_list[0])
+    return op(val_list[0])
 
 # Appending or pushing an argument to a list
-def append_push(args, varEnv, locEnv, funEnv, op, id_num):
+def append_push(args, varEnv, locEnv, funEnv, op, node):
     constraints = [[global_vars.ALL_TYPES], [["list"]]]
     val_list = definePrimitive(args, constraints, varEnv, locEnv[-1])
-    if val_list[0] == "error":
-        return val_list
 
-    val_list[1] = string_to_list(val_list[1])
     if isBool(args[0]):
         val_list[0] = args[0]
 
-    op(val_list[0], val_list[1])
-    val_list[1] = list_to_string(val_list[1])
-    val_list[1] = handle_maybe(val_list[1])
-    return ("not_error", val_list[1])
+    elem = list_element(val_list[0])
+    vector = op(elem, string_to_vector(val_list[1]))
+    return updated_list(val_list[1], vector, elem)
 
 # Get an element of a list, from its position in the list
-def listGet(args, varEnv, locEnv, funEnv, op, id_num):
+def listGet(args, varEnv, locEnv, funEnv, op, node):
     constraints = [[["num"]], [["list"]]]
     val_list = definePrimitive(args, constraints, varEnv, locEnv[-1])
-    if val_list[0] == "error":
-        return val_list
 
-    val_list[1] = string_to_list(val_list[1])
+    val_list[1] = string_to_vector(val_list[1])
 
     try:
-        toReturn = str(op(val_list[0], val_list[1]))
+        toReturn = to_value(op(val_list[0], val_list[1]))
         if toReturn == "maybe":
             if randint(0,1) == 0:
                 toReturn = "true"
             else:
                 toReturn = "false"
     except:
-        return ("error", "Error: Position does not exist in list")
+        raise EvalError("Error: Position does not exist in list")
 
-    return ("not_error", toReturn)
+    return toReturn
 
 
 # Puts an element in a list at the specified position
-def listPut(args, varEnv, locEnv, funEnv, op, id_num):
+def listPut(args, varEnv, locEnv, funEnv, op, node):
     constraints = [[global_vars.ALL_TYPES], [["num"]], [["list"]]]
     val_list = definePrimitive(args, constraints, varEnv, locEnv[-1])
-    if val_list[0] == "error":
-        return val_list
-    val_list[2] = string_to_list(val_list[2])
+    vector = string_to_vector(val_list[2])
 
     if isBool(args[0]):
         val_list[0] = args[0]
 
-    if abs(val_list[1]-time.localtime().tm_yday+1) > len(val_list[2])-1 and \
-        (val_list[1]-time.localtime().tm_yday+1) * (-1) != len(val_list[2]):
-        return ("error", "Error: Position does not exist in list")
-    val_list[2] = op(val_list[0], val_list[1], val_list[2])
-
-    val_list[2] = list_to_string(val_list[2])
-    val_list[2] = handle_maybe(val_list[2])
-    return ("not_error", val_list[2])
+    if abs(val_list[1]-today()) > len(vector)-1 and \
+        (val_list[1]-today()) * (-1) != len(vector):
+        raise EvalError("Error: Position does not exist in list")
+    elem = list_element(val_list[0])
+    vector = op(elem, val_list[1], vector)
+    return updated_list(val_list[2], vector, elem)
 
 
 # Inserts a value into a list at the specified position
-def listInsert(args, varEnv, locEnv, funEnv, op, id_num):
+def listInsert(args, varEnv, locEnv, funEnv, op, node):
     constraints = [[global_vars.ALL_TYPES], [["num"]], [["list"]]]
     val_list = definePrimitive(args, constraints, varEnv, locEnv[-1])
-    if val_list[0] == "error":
-        return val_list
-    val_list[2] = string_to_list(val_list[2])
+    vector = string_to_vector(val_list[2])
 
 
     if isBool(args[0]):
         val_list[0] = args[0]
 
-    if abs(val_list[1]-time.localtime().tm_yday+1) > len(val_list[2]):
-        val_list[1]-time.localtime().tm_yday+1
-        return ("error", "Error: No element there")
-    op(val_list[0], val_list[1], val_list[2])
-
-    val_list[2] = list_to_string(val_list[2])
-    val_list[2] = handle_maybe(val_list[2])
-    return ("not_error", val_list[2])
+    if abs(val_list[1]-today()) > len(vector):
+        val_list[1]-today()
+        raise EvalError("Error: No element there")
+    elem = list_element(val_list[0])
+    vector = op(elem, val_list[1], vector)
+    return updated_list(val_list[2], vector, elem)
 
 # Removes an element from the specified position of the list
-def listRemove(args, varEnv, locEnv, funEnv, op, id_num):
+def listRemove(args, varEnv, locEnv, funEnv, op, node):
     constraints = [[["num"]], [["list"]]]
     val_list = definePrimitive(args, constraints, varEnv, locEnv[-1])
-    if val_list[0] == "error":
-        return val_list
 
     if val_list[1] == "[]":
-        return ("errorDec", "DeclarationOfIndependence")
-    val_list[1] = string_to_list(val_list[1])
+        raise EvalError("DeclarationOfIndependence", "errorDec")
+    vector = string_to_vector(val_list[1])
 
-    if abs(val_list[0]-time.localtime().tm_yday+1) > len(val_list[1])-1 and \
-        (val_list[0]-time.localtime().tm_yday+1) * (-1) != len(val_list[1]):
-        return ("error", "Error: No element to remove")
+    if abs(val_list[0]-today()) > len(vector)-1 and \
+        (val_list[0]-today()) * (-1) != len(vector):
+        raise EvalError("Error: No element to remove")
 
-    if len(val_list[1]) == 1:
-        val_list[1] = []
+    if len(vector) == 1:
+        vector = PVector()
     else:
-        val_list[1] = op(val_list[0], val_list[1])
+        vector = op(val_list[0], vector)
+    return updated_list(val_list[1], vector)
+
+
+# Writes a string into the screen buffer (see screen.py), either at a row and
+# column (setCell) or as the whole of a row (writeRow).
+def screenWrite(args, varEnv, locEnv, funEnv, op, node):
+    constraints = [[["str"]]] + [[["num"]]] * (len(args) - 1)
+    val_list = definePrimitive(args, constraints, varEnv, locEnv[-1])
 
-    val_list[1] = list_to_string(val_list[1])
-    val_list[1] = handle_maybe(val_list[1])
-    return ("not_error", val_list[1])
+    val_list[0] = val_list[0][1:-1].replace("<'>", "\"")
+    try:
+        return op(*reversed(val_list))
+    except ValueError:
+        raise EvalError("Error: Argument out of range")
 
 
 # Initializes a new list of the specified length where each element is the
 # specified value
-def listInit(args, varEnv, locEnv, funEnv, op, id_num):
+def listInit(args, varEnv, locEnv, funEnv, op, node):
     constraints = [[global_vars.ALL_TYPES], [["num"]]]
     val_list = definePrimitive(args, constraints, varEnv, locEnv[-1])
-    if val_list[0] == "error":
-        return val_list
 
     if isBool(args[0]):
         val_list[0] = args[0]
@@ -404,69 +408,79 @@ def listInit(args, varEnv, locEnv, funEnv, op, id_num):
     if val_list[1] == 0:
         new_list = "[]"
     elif val_list[1] < 0:
-        return ("error", "Error: Invalid list size")
+        raise EvalError("Error: Invalid list size")
     else:
+        if budget.enabled:
+            budget.check_list_length(val_list[1])
         new_list = op(val_list[0], val_list[1])
         new_list = list_to_string(new_list)
         new_list = handle_maybe(new_list)
-    return ("not_error", new_list)
+    return new_list
 
 
-# Executes a mapping function.  Since the first argument is a function it is
-# handled separately.
-def listMap(args, varEnv, locEnv, funEnv, op, id_num):
+# Verifies the arguments of map, filter, all, and exists and returns the
+# function to be applied along with the elements of the list it is applied to.
+def listHofArgs(args, varEnv, locEnv, funEnv):
     if len(args) != 2:
-        return ("error", "Error: Incorrect number of arguments")
+        raise EvalError("Error: Incorrect number of arguments")
 
-    (error, val) = valid_function_check(args[0], varEnv, locEnv[-1], funEnv)
-    if error == "error":
-        return (error, val)
-    args[0] = val
+    args[0] = valid_function_check(args[0], varEnv, locEnv[-1], funEnv)
 
     constraints = [[["list"]]]
     val_list = definePrimitive([args[1]], constraints, varEnv, locEnv[-1])
-    if val_list[0] == "error":
-        return val_list
 
-    new_list = "[]"
     (fun, op) = funEnv.getVal(args[0], "function")[:2]
-    (append_fun, append_op) = funEnv.getVal("append", "function")[:2]
+    return (fun, op, string_to_list(val_list[0]))
 
-    val_list[0] = string_to_list(val_list[0])
-    for i in val_list[0]:
-        if args[0] not in global_vars.PRIMITIVES:
-            global_vars.curr_function.append(args[0])
-        if isinstance(i, list):
-            i = list_to_string(i)
-        else:
-            i = str(i)
 
-        (error, val) = fun([i], varEnv, locEnv, funEnv, op, id_num)
-        if error == "error":
-            return (error, val)
-        (error, new_list) = append_fun([str(val), new_list], varEnv, locEnv, \
-                                                      funEnv, append_op, id_num)
-        if error == "error":
-            return (error, new_list)
+# Calls the function passed to a higher-order list function on a single element
+# of the list.
+def listHofApply(name, fun, op, elem, varEnv, locEnv, funEnv, node):
+    if name not in global_vars.PRIMITIVES:
+        global_vars.curr_function.append(name)
+    if isinstance(elem, list):
+        elem = list_to_string(elem)
+    else:
+        elem = to_value(elem)
+    return fun([elem], varEnv, locEnv, funEnv, op, node)
+
 
-    return ("not_error", new_list)
+# Gets the value that appending elem to a list would store.  The result of a
+# higher-order list function is built up in a python list and only turned into
+# a string once all the elements have been added, instead of calling append
+# (and so re-parsing the entire list) once per element.
+def listElement(elem, varEnv, locEnv):
+    constraints = [[global_vars.ALL_TYPES]]
+    val_list = definePrimitive([to_value(elem)], constraints, varEnv, \
+                                                                 locEnv[-1])
+    if isBool(str(elem)):
+        val_list[0] = str(elem)
+    return val_list[0]
 
 
 # Executes a mapping function.  Since the first argument is a function it is
 # handled separately.
-def listFold(args, varEnv, locEnv, funEnv, op, id_num):
+def listMap(args, varEnv, locEnv, funEnv, op, node):
+    (fun, op, elems) = listHofArgs(args, varEnv, locEnv, funEnv)
+
+    new_list = []
+    for i in elems:
+        val = listHofApply(args[0], fun, op, i, varEnv, locEnv, funEnv, node)
+        new_list.append(listElement(val, varEnv, locEnv))
+
+    return handle_maybe(list_to_string(new_list))
+
+
+# Executes a mapping function.  Since the first argument is a function it is
+# handled separately.
+def listFold(args, varEnv, locEnv, funEnv, op, node):
     if len(args) != 3:
-        return ("error", "Error: Incorrect number of arguments")
+        raise EvalError("Error: Incorrect number of arguments")
 
-    (error, val) = valid_function_check(args[0], varEnv, locEnv[-1], funEnv)
-    if error == "error":
-        return (error, val)
-    args[0] = val
+    args[0] = valid_function_check(args[0], varEnv, locEnv[-1], funEnv)
 
     constraints = [[global_vars.ALL_TYPES], [["list"]]]
     val_list = definePrimitive(args[1:], constraints, varEnv, locEnv[-1])
-    if val_list[0] == "error":
-        return val_list
 
     (fun, op) = funEnv.getVal(args[0], "function")[:2]
 
@@ -479,7 +493,7 @@ def listFold(args, varEnv, locEnv, funEnv, op, id_num):
         if isinstance(i, list):
             i = list_to_string(i)
         else:
-            i = str(i)
+            i = to_value(i)
         if isinstance(val_list[0], list):
             val_list[0] = list_to_string(val_list[0])
         if isinstance(val_list[0], bool):
@@ -488,84 +502,55 @@ def listFold(args, varEnv, locEnv, funEnv, op, id_num):
             else:
                 val_list[0] = "false"
         else:
-            val_list[0] = str(val_list[0])
+            val_list[0] = to_value(val_list[0])
 
-        (error, val) = fun([i, val_list[0]], varEnv, locEnv, funEnv, op, id_num)
-        if error == "error":
-            return (error, val)
+        val = fun([i, val_list[0]], varEnv, locEnv, funEnv, op, node)
         val_list[0] = val
-    return ("not_error", val)
+    return val
 
 
 # Executes a filtering function.  Since the first argument is a function it is
 # handled separately.
-def listFilter(args, varEnv, locEnv, funEnv, op, id_num):
-    if len(args) != 2:
-        return ("error", "Error: Incorrect number of arguments")
-
-    (error, val) = valid_function_check(args[0], varEnv, locEnv[-1], funEnv)
-    if error == "error":
-        return (error, val)
-    args[0] = val
-
-    constraints = [[["list"]]]
-    val_list = definePrimitive([args[1]], constraints, varEnv, locEnv[-1])
-    if val_list[0] == "error":
-        return val_list
+def listFilter(args, varEnv, locEnv, funEnv, op, node):
+    (fun, op, elems) = listHofArgs(args, varEnv, locEnv, funEnv)
 
-    new_list = "[]"
-    (fun, op) = funEnv.getVal(args[0], "function")[:2]
-    (append_fun, append_op) = funEnv.getVal("append", "function")[:2]
-
-    val_list[0] = string_to_list(val_list[0])
-    for i in val_list[0]:
-        if args[0] not in global_vars.PRIMITIVES:
-            global_vars.curr_function.append(args[0])
-        if isinstance(i, list):
-            i = list_to_string(i)
-        else:
-            i = str(i)
-
-        (error, val) = fun([i], varEnv, locEnv, funEnv, op, id_num)
-        if error == "error":
-            return (error, val)
+    new_list = []
+    for i in elems:
+        val = listHofApply(args[0], fun, op, i, varEnv, locEnv, funEnv, node)
         if val == "true":
-            (error, new_list) = append_fun([str(i), new_list], varEnv, \
-                                              locEnv, funEnv, append_op, id_num)
+            new_list.append(listElement(i, varEnv, locEnv))
         elif val != "false":
-            return ("error", "Error: Bad type")
-        if error == "error":
-            return (error, new_list)
+            raise EvalError("Error: Bad type")
 
-    return ("not_error", new_list)
+    return handle_maybe(list_to_string(new_list))
 
 
-# Uses the listFilter function to defermine if all the elements in the list when
-# passed in as an argument to a given function return true.
-def listAll(args, varEnv, locEnv, funEnv, op, id_num):
-    (error, val) = listFilter(args, varEnv, locEnv, funEnv, op, id_num)
-    if error == "error":
-        return (error, val)
+# Applies a function to the elements of a list until one of them produces the
+# deciding value, in which case the deciding value is returned.  If no element
+# produces the deciding value, the opposite value is returned.  Used by all
+# (where false decides) and exists (where true decides).
+def listDecide(args, varEnv, locEnv, funEnv, node, deciding):
+    (fun, op, elems) = listHofArgs(args, varEnv, locEnv, funEnv)
 
-    constraints = [[["list"]]]
-    val_list = definePrimitive([args[1]], constraints, varEnv, locEnv[-1])
+    for i in elems:
+        val = listHofApply(args[0], fun, op, i, varEnv, locEnv, funEnv, node)
+        if val == deciding:
+            return deciding
+        elif val != "true" and val != "false":
+            raise EvalError("Error: Bad type")
 
-    if len(string_to_list(val_list[0])) == len(string_to_list(val)):
-        return ("not_error", "true")
-    else:
-        return ("not_error", "false")
+    return "true" if deciding == "false" else "false"
 
-# Uses the listFilter function to defermine if any element in a list when passed
-# in as an argument to a given function return true.
-def listExists(args, varEnv, locEnv, funEnv, op, id_num):
-    (error, val) = listFilter(args, varEnv, locEnv, funEnv, op, id_num)
-    if error == "error":
-        return (error, val)
 
-    if len(string_to_list(val)) > 0:
-        return ("not_error", "true")
-    else:
-        return ("not_error", "false")
+# Determines if all the elements in the list when passed in as an argument to
+# a given function return true.
+def listAll(args, varEnv, locEnv, funEnv, op, node):
+    return listDecide(args, varEnv, locEnv, funEnv, node, "false")
+
+# Determines if any element in a list when passed in as an argument to a given
+# function returns true.
+def listExists(args, varEnv, locEnv, funEnv, op, node):
+    return listDecide(args, varEnv, locEnv, funEnv, node, "true")
 
 
 # For the casting functions below, only certain types can be cast to other
@@ -574,159 +559,152 @@ def listExists(args, varEnv, locEnv, funEnv, op, id_num):
 # Cast to a number.  Only numbers, strigs, and lists can be
 
 # Casts to a number.
-def castNum(args, varEnv, locEnv, funEnv, op, id_num):
+def castNum(args, varEnv, locEnv, funEnv, op, node):
     constraints = [[["num", "str", "list"]]]
     val_list = definePrimitive(args, constraints, varEnv, locEnv[-1])
-    if val_list[0] == "error":
-        return val_list
 
     if isList(val_list[0]):
         if len(string_to_list(val_list[0])) == 1:
             arg = string_to_list(val_list[0])[0]
             constraints = [[["num"]]]
-            val_list = definePrimitive([str(arg)], constraints, varEnv, \
+            try:
+                val_list = definePrimitive([str(arg)], constraints, varEnv, \
                                                                     locEnv[-1])
-            if val_list[0] == "error":
-                return ("error", "Error: Argument cannot be a num")
+            except EvalError:
+                raise EvalError("Error: Argument cannot be a num")
         else:
-            return ("error", "Error: Argument cannot be a num")
+            raise EvalError("Error: Argument cannot be a num")
     if isString(val_list[0]):
          val_list[0] = val_list[0][1:-1]
-    try:
-        return ("not_error", op(val_list[0]))
-    except:
-        return ("error", "Error: Argument cannot be a num")
+    num = op(val_list[0])
+    if num == None:
+        raise EvalError("Error: Argument cannot be a num")
+    return num
 
 # Casts to a boolean.
-def castBool(args, varEnv, locEnv, funEnv, op, id_num):
+def castBool(args, varEnv, locEnv, funEnv, op, node):
     constraints = [[["bool", "str", "list"]]]
     val_list = definePrimitive(args, constraints, varEnv, locEnv[-1])
-    if val_list[0] == "error":
-        return val_list
 
     if isList(val_list[0]):
         if len(string_to_list(val_list[0])) == 1:
             arg = string_to_list(val_list[0])[0]
             constraints = [[["bool"]]]
-            val_list = definePrimitive([str(arg)], constraints, varEnv, \
+            try:
+                val_list = definePrimitive([str(arg)], constraints, varEnv, \
                                                                     locEnv[-1])
-            if val_list[0] == "error":
-                return ("error", "Error: Argument cannot be a bool")
+            except EvalError:
+                raise EvalError("Error: Argument cannot be a bool")
         else:
-            return ("error", "Error: Argument cannot be a bool")
+            raise EvalError("Error: Argument cannot be a bool")
     if isString(val_list[0]):
         if isBool(val_list[0][1:-1]):
-            return ("not_error", val_list[0][1:-1])
+            return val_list[0][1:-1]
         else:
-            return ("error", "Error: Argument cannot be a bool")
+            raise EvalError("Error: Argument cannot be a bool")
     if isinstance(val_list[0], bool):
-         return ("not_error", "true" if val_list[0] else "false")
+         return "true" if val_list[0] else "false"
 
 
 # Casts to a string.
-def castStr(args, varEnv, locEnv, funEnv, op, id_num):
+def castStr(args, varEnv, locEnv, funEnv, op, node):
     constraints = [[global_vars.ALL_TYPES]]
     val_list = definePrimitive(args, constraints, varEnv, locEnv[-1])
-    if val_list[0] == "error":
-        return val_list
 
     if isinstance(val_list[0], bool):
-        return ("not_error", op("true") if val_list[0] else op("false"))
+        return op("true") if val_list[0] else op("false")
     if val_list[0] == "Nothing":
-        return ("not_error", op("Nothing"))
+        return op("Nothing")
 
     if isNum(val_list[0]):
-        return ("not_error", op(str(val_list[0])))
+        return op(str(val_list[0]))
     if isList(val_list[0]):
         temp = handle_maybe(val_list[0])
         temp = str(temp)
         temp = temp.replace("\"", "<'>")
-        return ("not_error", op(temp))
-    return ("not_error", val_list[0])
+        return op(temp)
+    return val_list[0]
 
 
 # Casts to a list.
-def castList(args, varEnv, locEnv, funEnv, op, id_num):
+def castList(args, varEnv, locEnv, funEnv, op, node):
     constraints = [[global_vars.ALL_TYPES]]
     val_list = definePrimitive(args, constraints, varEnv, locEnv[-1])
-    if val_list[0] == "error":
-        return val_list
 
     if isList(val_list[0]):
-        return ("not_error", val_list[0])
+        return val_list[0]
     if isinstance(val_list[0], bool):
-        return ("not_error", "[true]" if val_list[0] else "[false]")
-    return ("not_error", op(val_list[0]))
+        return "[true]" if val_list[0] else "[false]"
+    return op(val_list[0])
 
 
 # Casts to a nonetype.
-def castNonetype(args, varEnv, locEnv, funEnv, op, id_num):
+def castNonetype(args, varEnv, locEnv, funEnv, op, node):
     constraints = [[["str", "list", "nonetype"]]]
     val_list = definePrimitive(args, constraints, varEnv, locEnv[-1])
-    if val_list[0] == "error":
-        return val_list
 
     if isList(val_list[0]):
         if len(string_to_list(val_list[0])) == 1:
             arg = string_to_list(val_list[0])[0]
             constraints = [[["nonetype"]]]
-            val_list = definePrimitive([str(arg)], constraints, varEnv, \
+            try:
+                val_list = definePrimitive([str(arg)], constraints, varEnv, \
                                                                     locEnv[-1])
-            if val_list[0] == "error":
-                return ("error", "Error: Argument cannot be a nonetype")
+            except EvalError:
+                raise EvalError("Error: Argument cannot be a nonetype")
         else:
-            return ("error", "Error: Argument cannot be a nonetype")
+            raise EvalError("Error: Argument cannot be a nonetype")
     if isNothing(val_list[0]):
-        return ("not_error", "Nothing")
+        return "Nothing"
     if isString(val_list[0]):
         if isNothing(val_list[0][1:-1]):
-            return ("not_error", val_list[0][1:-1])
+            return val_list[0][1:-1]
         else:
-            return ("error", "Error: Argument cannot be a nonetype")
+            raise EvalError("Error: Argument cannot be a nonetype")
 
 
 # Variable assignment.  This function is one of the more lengthy ones, mainly
 # because of the necssary error-checking and because it is specialized
 # enought that definePrimitive() can't really be called.
-def defineVar(args, varEnv, locEnv, funEnv, op, id_num=None):
+def defineVar(args, varEnv, locEnv, funEnv, op, node=None):
     if len(args) != 2:
-        return ("error", "Error: Incorrect number of arguments")
+        raise EvalError("Error: Incorrect number of arguments")
     constraints = [[global_vars.ALL_TYPES]]
 
+    # lists that are already Values are in the correct format (see
+    # definePrimitive())
     for arg in args:
-       if isList(arg) and string_check(arg) != None:
-            return string_check(arg)
+       if isList(arg) and not isinstance(arg, Value) and \
+                                                string_check(arg) != None:
+            raise EvalError(string_check(arg)[1])
 
     val_list = []
     (toAppend, constraints[0][0]) = general_type(args[1], constraints[0], \
                                                             varEnv, locEnv[-1])
-    if toAppend[0] == "error":
-        return toAppend
     val_list.append(toAppend)
 
     if isLiteral(args[0]) or args[0] in global_vars.VARIABLE_RESERVED_TERMS:
-        return ("error", "Error: Name is reserved")
+        raise EvalError("Error: Name is reserved")
     if "//" in args[0][2:] or args[0][:-2] == "_g":
-        return ("error", "Error: Name contains reserved symbol")
+        raise EvalError("Error: Name contains reserved symbol")
 
     if len(args[0]) > 2: #avoids the necessity of a try-except
         if args[0][:2] == "//" and funEnv.inEnv(args[0][2:]):
             args[0] = args[0][2:]
         elif args[0][:2] == "//" and not funEnv.inEnv(args[0][2:]):
-            return ("error", "Argument is not a function")
+            raise EvalError("Argument is not a function")
 
     if re.sub('\W+', "", args[0]) != args[0]:
-        return ("error", "Error: Name contains reserved symbol")
+        raise EvalError("Error: Name contains reserved symbol")
 
-    if isNum(val_list[0]):
-        if float(val_list[0]) == int(float(val_list[0])):
-             val_list[0] = str(int(float(val_list[0]))) #eg. "3.0"->3.0->3->"3"
-        else:
-            val_list[0] = str(float(val_list[0]))
+    # whole numbers are stored as ints (eg. "3.0"->3->"3")
+    if isNum(val_list[0]) and native_num(val_list[0]) != None:
+        num = native_num(val_list[0])
+        if not isinstance(num, float) or not isinstance(val_list[0], Value):
+            val_list[0] = num_value(num)
 
-    if isList(val_list[0]) and \
-                        list_check(val_list[0], varEnv, locEnv[-1]) != None:
-        return list_check(val_list[0], varEnv, locEnv[-1])
+    if isList(val_list[0]):
+        list_check(val_list[0], varEnv, locEnv[-1])
 
     if global_vars.user_function > 0 and args[0][-2:] != "_g":
         locEnv[-1].addBind(args[0], val_list[0], constraints[0])
@@ -734,14 +712,12 @@ def defineVar(args, varEnv, locEnv, funEnv, op, id_num=None):
         if args[0][-2:] == "_g":
             args[0] = args[0][:-2]
         varEnv.addBind(args[0], val_list[0], constraints[0])
-    return ("not_error", args[0]) 
+    return args[0]
 
 # Check-expect
-def check_expect (args, varEnv, locEnv, funEnv, op, id_num):
+def check_expect (args, varEnv, locEnv, funEnv, op, node):
     constraints = [[global_vars.ALL_TYPES], [global_vars.ALL_TYPES]]
     val_list = definePrimitive(args, constraints, varEnv, locEnv[-1])
-    if val_list[0] == "error":
-        return val_list
 
     val_list = map(lambda x: x if not isinstance(x, bool) else "true" \
                                                 if x else "false", val_list)
@@ -753,199 +729,190 @@ def check_expect (args, varEnv, locEnv, funEnv, op, id_num):
             pass
 
     if val_list[0] == val_list[1]:
-        return ("not_error", "Check was " + str(val_list[0]) + ", as expected")
+        return "Check was " + str(val_list[0]) + ", as expected"
     else:
-        return ("error", "Error: Result was supposed to be " + \
+        raise EvalError("Error: Result was supposed to be " + \
                     str(val_list[1]) + ", but was actually " + str(val_list[0]))
 
 # Check-error
-def check_error (args, varEnv, locEnv, funEnv, op, id_num):
+def check_error (args, varEnv, locEnv, funEnv, op, node):
     if len(args) != 1:
         global_vars.check_error = False
-        return ("error", "Error: Incorrect number of arguments")
+        raise EvalError("Error: Incorrect number of arguments")
     constraints = [[global_vars.ALL_TYPES]]
-    val_list = definePrimitive(args, constraints, varEnv, locEnv[-1])
-
+    try:
+        definePrimitive(args, constraints, varEnv, locEnv[-1])
+    except EvalError:
+        global_vars.check_error = False
+        return "Expression failed, as expected"
     global_vars.check_error = False
-    if val_list[0] == "error":
-        return ("not_error", "Expression failed, as expected")
-    else:
-        return ("error", "Error: Expression did not fail")
+    raise EvalError("Error: Expression did not fail")
 
 # Empties a function environment--the local environment if within a function;
 # the variable environment if not.
-def empty(args, varEnv, locEnv, funEnv, op, id_num):
+def empty(args, varEnv, locEnv, funEnv, op, node):
     if global_vars.user_function > 0:
         locEnv.empty()
     else:
         varEnv.empty()
-    return ("not_error", "Nothing")
-
-
-# The conditional and loop functions below work in a similar manner.  Evaluating
-# an expression overwrites the original expression with that expression's
-# result.  This presents a problem for conditionals--because it's possible that
-# we will not want to evaluate to body of the conditional and normal evaluation
-# will automatically evaluate the entirety of an expression--and also for
-# loops--both for the reason stated above, but also because a loop that runs
-# more than one time will need to be evaluated again, but the portion of the
-# tree that needs to be evaluated will have already been overwritten by
-# evaluating the first iteration of the loop.  The solution is to pass the
-# function the id number of the conditional or loop in the tree, so that the
-# function can get the node of the tree in question.  Then, once it has that
-# node, the appropriate branches of the subtree can be evaluated.  For a
-# conditional, the first expression is evaluated and based on the result, either
-# the true or false branch is evaluated with the other ignored.  This means
-# that an error in the non-evaluated branch will not be found (this is not
-# necessarily a bad thing).  For a loop, a similar process occurs, but after
-# each iteration of the tree is evaluated, the resulting value is saved and the
-# loop function then calls itself, repeating the process until the loop's 
-# conditional statement evaluates to false and a final result has been has
-# found.
+    return "Nothing"
+
+
+# The conditional and loop functions below work in a similar manner.  Normal
+# evaluation evaluates every argument of a function before calling it.  This
+# presents a problem for conditionals--because it's possible that we will not
+# want to evaluate the body of the conditional--and also for loops--both for
+# the reason stated above, but also because a loop that runs more than one
+# time will need to evaluate its condition and body again on every pass.  The
+# solution is that every primitive is passed the node of the tree that called
+# it (see Node.evaluate()), so these functions can evaluate the appropriate
+# branches of that node themselves.  Evaluating a node does not change it, so
+# a branch can be evaluated as many times as needed.  For a conditional, the
+# first expression is evaluated and based on the result, either the true or
+# false branch is evaluated with the other ignored.  This means that an error
+# in the non-evaluated branch will not be found (this is not necessarily a
+# bad thing).  For a loop, a similar process occurs, but after each iteration
+# of the body is evaluated, the resulting value is saved and the loop carries
+# on until the loop's conditional statement evaluates to false (or, for a for
+# loop, the list runs out) and a final result has been found.
 
 
 # It should be noted that conditionals and loops both must be a single
 # expression.
 
 # For if-statements with both a true and a false branch
-def conditional(args, varEnv, locEnv, funEnv, op, id_num):
-    tree_section = global_vars.curr_tree[-1].get_node(id_num)
+def conditional(args, varEnv, locEnv, funEnv, op, node):
     for i in range(3):
-        if (tree_section.getChild(i)).getVal() == None:
-            return ("error", "Error: Incorrect number of arguments")
+        if (node.getChild(i)).getVal() == None:
+            raise EvalError("Error: Incorrect number of arguments")
 
-    conditional = (tree_section.getChild(0)).evaluate(varEnv, funEnv, locEnv)
-    if conditional[0] == "error":
-         return conditional
+    conditional = (node.getChild(0)).evaluate(varEnv, funEnv, locEnv)
 
     constraints = [[["bool"]]]
-    val_list = definePrimitive([conditional[1]], constraints, varEnv, locEnv[-1])
-    if val_list[0] == "error":
-        return val_list
+    val_list = definePrimitive([conditional], constraints, varEnv, locEnv[-1])
 
     if isinstance(val_list[0], bool):
         if val_list[0]:
-            body = (tree_section.getChild(1)).evaluate(varEnv, funEnv, locEnv)
+            body = (node.getChild(1)).evaluate(varEnv, funEnv, locEnv)
         else:
-            body = (tree_section.getChild(2)).evaluate(varEnv, funEnv, locEnv)
-        if body[0] == "error":
-            return body
+            body = (node.getChild(2)).evaluate(varEnv, funEnv, locEnv)
         return verifyResult(body, varEnv, locEnv)
     else:
-        return ("error", "Error: Bad type")
+        raise EvalError("Error: Bad type")
 
 
 # For if statements with only one branch (ifTrue and ifFalse)
-def condArrityTwo(args, varEnv, locEnv, funEnv, op, id_num):
-    tree_section = global_vars.curr_tree[-1].get_node(id_num)
+def condArrityTwo(args, varEnv, locEnv, funEnv, op, node):
     for i in range(2):
-        if (tree_section.getChild(i)).getVal() == None:
-            return ("error", "Error: Incorrect number of arguments")
+        if (node.getChild(i)).getVal() == None:
+            raise EvalError("Error: Incorrect number of arguments")
 
-    conditional = (tree_section.getChild(0)).evaluate(varEnv, funEnv, locEnv)
-    if conditional[0] == "error":
-         return conditional
+    conditional = (node.getChild(0)).evaluate(varEnv, funEnv, locEnv)
 
     constraints = [[["bool"]]]
-    val_list = definePrimitive([conditional[1]], constraints, varEnv, locEnv[-1])
-    if val_list[0] == "error":
-        return val_list
+    val_list = definePrimitive([conditional], constraints, varEnv, locEnv[-1])
 
     if isinstance(val_list[0], bool):
         if val_list[0] == op():
-            body = (tree_section.getChild(1)).evaluate(varEnv, funEnv, locEnv)
-            if body[0] == "error":
-                return body
+            body = (node.getChild(1)).evaluate(varEnv, funEnv, locEnv)
             return verifyResult(body, varEnv, locEnv)
         else:
-            return ("not_error", "Nothing")
+            return "Nothing"
     else:
-        return ("error", "Error: Bad type")
+        raise EvalError("Error: Bad type")
 
 
 # While loops
-def wloop(args, varEnv, locEnv, funEnv, op, id_num, prev_val="Nothing"):
-    tree_section = global_vars.curr_tree[-1].get_node(id_num)
-    if (tree_section.getChild(0)).getVal() == None or \
-       (tree_section.getChild(1)).getVal() == None:
-       return ("error", "Error: Incorrect number of arguments")
-
-    conditional = (tree_section.getChild(0)).evaluate(varEnv, funEnv, locEnv)
-    if conditional[0] == "error":
-        return conditional
-
-    if isBool(conditional[1]):
-        if getBoolVal(conditional[1]):
-            body = (tree_section.getChild(1)).evaluate(varEnv, funEnv, locEnv)
-            if body[0] == "error":
-                return body
+def wloop(args, varEnv, locEnv, funEnv, op, node, prev_val="Nothing"):
+    if (node.getChild(0)).getVal() == None or \
+       (node.getChild(1)).getVal() == None:
+       raise EvalError("Error: Incorrect number of arguments")
+
+    conditional = (node.getChild(0)).evaluate(varEnv, funEnv, locEnv)
+
+    if isBool(conditional):
+        if getBoolVal(conditional):
+            body = (node.getChild(1)).evaluate(varEnv, funEnv, locEnv)
             try:
-                return wloop([], varEnv, locEnv, funEnv, op, id_num, body[1])
+                return wloop([], varEnv, locEnv, funEnv, op, node, body)
+            except EvalError:
+                raise
             except:
-                return ("error", "Error: Infinite loop")
+                raise EvalError("Error: Infinite loop")
         else:
-            prev_val = ("not_error", prev_val)
             return verifyResult(prev_val, varEnv, locEnv)
     else:
-        return ("error", "Error: Bad type")
+        raise EvalError("Error: Bad type")
 
 
-# For loops
-def floop(args, varEnv, locEnv, funEnv, op, id_num, prev_val="Nothing", \
-                                                                   iteration=0):
-    tree_section = global_vars.curr_tree[-1].get_node(id_num)
+# For loops.  The list is evaluated once, before the first pass through the
+# body, and the loop then steps through its elements.  When the list is a call
+# to range or rangeFrom, the numbers are produced one at a time and the list
+# itself is never built, so a loop over a million numbers takes no more memory
+# than a loop over ten.
+def floop(args, varEnv, locEnv, funEnv, op, node):
     for i in range(4):
-        if (tree_section.getChild(i)).getVal() == None:
-            return ("error", "Error: Incorrect number of arguments")
-    if (tree_section.getChild(1)).getVal() != "in":
-        return ("error", "Error: \"in\" keyword is missing")
-
-    constraints = [[["list"]]]
-    list_arg = (tree_section.getChild(2)).evaluate(varEnv, funEnv, locEnv)
-    if list_arg[0] == "error":
-        return list_arg
-    list_val = definePrimitive([list_arg[1]], constraints, varEnv, locEnv[-1])
-    if list_val[0] == "error":
-        return list_val
-    if list_val[0] == "[]":
-        list_val = []
-        iterator_val = defineVar([args[0], "Nothing"], varEnv, locEnv, funEnv, \
-                                                                           None)
-        if iterator_val[0] == "error":
-            return iterator_val
-    else:
-        list_val = string_to_list(list_val[0])
-
-    if len(list_val) > iteration:
-        var_arg = (tree_section.getChild(0)).evaluate(varEnv, funEnv, locEnv)
-        if var_arg[0] == "error":
-            return var_arg
-        arg_list = [var_arg[1], str(list_val[iteration])]
-        iterator_val = defineVar(arg_list, varEnv, locEnv, funEnv, None)
-        if iterator_val[0] == "error":
-            return iterator_val
-        body = (tree_section.getChild(3)).evaluate(varEnv, funEnv, locEnv)
-        if body[0] == "error":
-            return body
-        return floop([], varEnv, locEnv, funEnv, op, id_num, body[1], \
-                                                                    iteration+1)
+        if (node.getChild(i)).getVal() == None:
+            raise EvalError("Error: Incorrect number of arguments")
+    if (node.getChild(1)).getVal() != "in":
+        raise EvalError("Error: \"in\" keyword is missing")
+
+    list_node = node.getChild(2)
+    if list_node.getVal() in global_vars.LAZY_SEQUENCES and \
+                                            list_node.getNumChildren() != -1:
+        elements = __lazy_sequence(list_node, varEnv, funEnv, locEnv)
     else:
-        prev_val = ("not_error", prev_val)
-        return verifyResult(prev_val, varEnv, locEnv)
+        constraints = [[["list"]]]
+        list_arg = list_node.evaluate(varEnv, funEnv, locEnv)
+        list_val = definePrimitive([list_arg], constraints, varEnv, locEnv[-1])
+        if list_val[0] == "[]":
+            elements = []
+        else:
+            elements = string_to_list(list_val[0])
+
+    if len(elements) == 0:
+        defineVar([args[0], "Nothing"], varEnv, locEnv, funEnv, None)
+        return verifyResult("Nothing", varEnv, locEnv)
+
+    var_arg = (node.getChild(0)).evaluate(varEnv, funEnv, locEnv)
+    prev_val = "Nothing"
+    for element in elements:
+        defineVar([var_arg, to_value(element)], varEnv, locEnv, funEnv, None)
+        prev_val = (node.getChild(3)).evaluate(varEnv, funEnv, locEnv)
+    return verifyResult(prev_val, varEnv, locEnv)
+
+
+# This is a private helper function to floop().  It evaluates a call to range
+# or rangeFrom the way the node's evaluate() function would, except that the
+# primitive is given xrange in place of range, so that the numbers are not
+# produced until the loop asks for them.
+def __lazy_sequence(node, varEnv, funEnv, locEnv):
+    args = [child.evaluate(varEnv, funEnv, locEnv) for child in node.children]
+    args = filter(lambda x: x != None, args)
+    fun = funEnv.getVal(node.getVal(), "function")[0]
+    return fun(args, varEnv, locEnv, funEnv, xrange, node)
 
 
 # Claims (assertions)
-def claim(args, varEnv, locEnv, funEnv, op, id_num):
+def claim(args, varEnv, locEnv, funEnv, op, node):
     constraints = [[global_vars.ALL_TYPES]]
     val_list = definePrimitive(args, constraints, varEnv, locEnv[-1])
-    if val_list[0] == "error":
-        return val_list
 
     if isinstance(val_list[0], bool):
-        return (("not_error", "Nothing") \
-                if val_list[0] \
-                else ("claim_failed", "Claim failed: Claim not as expected"))
-    return ("error", "Error: Claim can't be verified or disproven")
+        if val_list[0]:
+            return "Nothing"
+        raise EvalError("Claim failed: Claim not as expected", "claim_failed")
+    raise EvalError("Error: Claim can't be verified or disproven")
+
+
+# Marks the line to snapshot the interpreter to the given file.  The snapshot
+# is taken once the whole line has been evaluated (see snapshot.py).
+def snapshotState(args, varEnv, locEnv, funEnv, op, node):
+    constraints = [[["str"]]]
+    val_list = definePrimitive(args, constraints, varEnv, locEnv[-1])
+
+    snapshot.requested = val_list[0][1:-1]
+    return "Nothing"
 
 
 # Determines whether or not the parameter in the function header is simply a
@@ -978,7 +945,7 @@ def __parse_parameter(param):
 # a function returns, its variable environment is popped off the stack.  The
 # value returned from a function is simply the value of the last expression that
 # was evaluated within a function.
-def userFun(args, varEnv, locEnv, funEnv, body, id_num, pm=0):
+def userFun(args, varEnv, locEnv, funEnv, body, node, pm=0):
     params = string_to_list(funEnv.getFunc(global_vars.curr_function[-1])[pm][0][1][0][2])
 
     if funEnv.getNumFuncs(global_vars.curr_function[-1]) != 1:
@@ -989,47 +956,102 @@ def userFun(args, varEnv, locEnv, funEnv, body, id_num, pm=0):
                 params[i] = __parse_parameter(params[i])
 
     if len(params) != len(args):
-        return ("error", "Error: Incorrect number of arguments")
-
+        global_vars.curr_function.pop()
+        raise EvalError("Error: Incorrect number of arguments")
+
+    if stats.enabled:
+        stats.count("userFun.calls")
+        stats.count("userFun.{}.calls".format(global_vars.curr_function[-1]))
+    if memprofile.enabled:
+        memprofile.start_function(global_vars.curr_function[-1])
+    if global_vars.watch_calls != None:
+        global_vars.watch_calls.add(global_vars.curr_function[-1])
     global_vars.user_function += 1
     locEnv.append(Environment())
-    for i in range(len(args)):
-        args[i] = ("not_error", args[i])
-        arg = str(verifyResult(args[i], varEnv, locEnv[:-1])[1])
-
-        if not isNum(params[i]) and params[i] != "_":
-            result = defineVar([params[i], arg], varEnv, locEnv, funEnv, None)
-            if result[0] == "error":
-                return result
-
-    expressions = body[1:]
-    for i in range(len(expressions)):
-        emptyTree = ExpressionTree(expressions[i])
-        expTree = makeTree(emptyTree, funEnv, 0, False)
-        expTree.epsteinCheck(varEnv, funEnv, emptyTree, locEnv)
-        global_vars.curr_tree.append(expTree)
-
-        if emptyTree.get_string_length() == 0:
-            result = expTree.seven_and_checkCheck()
-            if result[0] == "error":
-                return ("error@"+str(i)+";"+str(pm), result[1])
-            else:
-                (error, val) = expTree.evaluate(varEnv, funEnv, locEnv)
-                if error != "not_error":
-                    if "@" in error:
-                        return (error, val)
-                    else:
-                        return (error+"@"+str(i)+";"+str(pm), val)
+    # what was pushed above is popped even if the body raises an error, so
+    # that nothing is left over for the next expression (eg. one run after
+    # a check-error, or by the same Interpreter; see embed.py)
+    try:
+        for i in range(len(args)):
+            arg = to_value(verifyResult(args[i], varEnv, locEnv[:-1]))
+
+            if not isNum(params[i]) and params[i] != "_":
+                defineVar([params[i], arg], varEnv, locEnv, funEnv, None)
+
+        expressions = body[1:]
+        for i in range(len(expressions)):
+            key = __tree_key(expressions[i], varEnv, funEnv, locEnv)
+            expTree = __compiled_tree(expressions[i], key)
+            if expTree == None:
+                emptyTree = ExpressionTree(expressions[i])
+                expTree = makeTree(emptyTree, funEnv, 0, False)
+                expTree.epsteinCheck(varEnv, funEnv, emptyTree, locEnv)
+
+                if emptyTree.get_string_length() != 0:
+                    raise __located(EvalError(\
+                        "Error: Incorrect number of arguments"), i, pm, funEnv)
+                try:
+                    expTree.seven_and_checkCheck()
+                except EvalError as error:
+                    raise __located(error, i, pm, funEnv)
+                expTree.foldConstants(varEnv, funEnv, locEnv)
+                expTree.markCommonSubtrees()
+                global_vars.compiled_trees[id(expressions[i])] = \
+                                                (expressions[i], key, expTree)
+
+            # what evaluateTree() in node.py does, done here so that each
+            # call of a user-defined function costs one Python frame less
+            if expTree.cse_marked:
+                global_vars.cse_caches.append(dict())
+            try:
+                val = expTree.evaluate(varEnv, funEnv, locEnv)
+            except EvalError as error:
+                if error.location == None:
+                    __located(error, i, pm, funEnv)
+                raise
+            finally:
+                if expTree.cse_marked:
+                    global_vars.cse_caches.pop()
+            # replace() would turn a Value (eg. a list with its PVector) back
+            # into a plain string, so it is only called when it changes
+            # something
+            if "<'>" in val:
                 val = val.replace("<'>", "\"")
-                varEnv.addBindit("it", val)
-        else:
-            return ("error@"+str(i)+";"+str(pm), "Error: Incorrect number of arguments")
-        global_vars.curr_tree.pop()
-
-    locEnv.pop()
-    global_vars.curr_function.pop()
-    global_vars.user_function -= 1
-    return (error, handle_bool(val))
+            varEnv.addBindit("it", val)
+    finally:
+        locEnv.pop()
+        global_vars.curr_function.pop()
+        global_vars.user_function -= 1
+        if memprofile.enabled:
+            memprofile.end_function()
+    return handle_bool(val)
+
+
+# Trees are not changed by being evaluated, so the tree built for an expression
+# of a function's body is kept and reused by later calls to the function.  How
+# a tree is built depends on which of the expression's names are functions
+# (and of what arrity), local variables, and global variables, so a tree is
+# only reused if all of these are the same as when it was built.  The two
+# functions below work out that key and look up the tree.
+def __tree_key(expression, varEnv, funEnv, locEnv):
+    return tuple([(funEnv.getArrity(name), locEnv[-1].inEnv(name), \
+                   varEnv.inEnv(name)) for name in expression \
+                                            if not isinstance(name, Value)])
+
+def __compiled_tree(expression, key):
+    compiled = global_vars.compiled_trees.get(id(expression))
+    if compiled != None and compiled[0] is expression and compiled[1] == key:
+        return compiled[2]
+    return None
+
+
+# Adds the current function and the position of the i-th expression of its body
+# (pattern pm) to an error raised by that expression, and returns the error.
+def __located(error, i, pm, funEnv):
+    source_map = funEnv.getFunc(global_vars.curr_function[-1])[pm][0][-1][2]
+    error.function = global_vars.curr_function[-1]
+    error.location = source_map[i]
+    return error
 
 
 # This short function is necessary because if a function wishes to simply return
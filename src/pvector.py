@@ -0,0 +1,181 @@
+#
+# Matthew Epstein
+# pvector.py
+# This file holds the PVector class, an immutable list that backs p-scheme's
+# lists.  p-scheme lists are values: putting an element into a list produces a
+# new list and leaves the old one as it was.  Doing this with python lists
+# means copying the entire list on every update, which is the main cost of
+# programs that update a grid cell by cell.  A PVector is a balanced binary
+# tree (an AVL tree) whose nodes are ordered by position rather than by key.
+# Updating a PVector copies only the nodes on the path from the root to the
+# position being updated; every other node is shared between the old and the
+# new PVector.  Getting, putting, inserting, and removing an element, as well
+# as appending and pushing, therefore all take logarithmic time and memory.
+# Positions follow python's rules, so -1 is the last element of the list.
+#
+
+
+class _Node(object):
+    __slots__ = ("left", "val", "right", "size", "height")
+
+    def __init__(self, left, val, right):
+        self.left = left
+        self.val = val
+        self.right = right
+        self.size = _size(left) + _size(right) + 1
+        self.height = max(_height(left), _height(right)) + 1
+
+
+# The two functions below are fairly self-explanatory.
+def _size(node):
+    return node.size if node != None else 0
+
+def _height(node):
+    return node.height if node != None else 0
+
+
+# Creates a node out of two subtrees whose heights differ by at most two,
+# rotating the subtrees if necessary so that the resulting tree is balanced.
+def _balance(left, val, right):
+    if _height(left) > _height(right) + 1:
+        if _height(left.left) >= _height(left.right):
+            return _Node(left.left, left.val, _Node(left.right, val, right))
+        mid = left.right
+        return _Node(_Node(left.left, left.val, mid.left), mid.val, \
+                                                  _Node(mid.right, val, right))
+    if _height(right) > _height(left) + 1:
+        if _height(right.right) >= _height(right.left):
+            return _Node(_Node(left, val, right.left), right.val, right.right)
+        mid = right.left
+        return _Node(_Node(left, val, mid.left), mid.val, \
+                                      _Node(mid.right, right.val, right.right))
+    return _Node(left, val, right)
+
+
+# Builds a balanced tree out of items[lo:hi].
+def _build(items, lo, hi):
+    if lo >= hi:
+        return None
+    mid = (lo + hi) // 2
+    return _Node(_build(items, lo, mid), items[mid], _build(items, mid+1, hi))
+
+
+def _set(node, i, val):
+    left_size = _size(node.left)
+    if i < left_size:
+        return _Node(_set(node.left, i, val), node.val, node.right)
+    if i > left_size:
+        return _Node(node.left, node.val, _set(node.right, i-left_size-1, val))
+    return _Node(node.left, val, node.right)
+
+
+def _insert(node, i, val):
+    if node == None:
+        return _Node(None, val, None)
+    left_size = _size(node.left)
+    if i <= left_size:
+        return _balance(_insert(node.left, i, val), node.val, node.right)
+    return _balance(node.left, node.val, \
+                                       _insert(node.right, i-left_size-1, val))
+
+
+def _remove(node, i):
+    left_size = _size(node.left)
+    if i < left_size:
+        return _balance(_remove(node.left, i), node.val, node.right)
+    if i > left_size:
+        return _balance(node.left, node.val, _remove(node.right, i-left_size-1))
+    if node.left == None:
+        return node.right
+    if node.right == None:
+        return node.left
+    (first, rest) = _remove_first(node.right)
+    return _balance(node.left, first, rest)
+
+
+# Removes the first element of a tree, returning the element and the new tree.
+def _remove_first(node):
+    if node.left == None:
+        return (node.val, node.right)
+    (first, rest) = _remove_first(node.left)
+    return (first, _balance(rest, node.val, node.right))
+
+
+class PVector(object):
+    __slots__ = ("root",)
+
+    # Initializes the PVector with the elements of items (a python list).
+    def __init__(self, items=[]):
+        self.root = _build(items, 0, len(items))
+
+    def __len__(self):
+        return _size(self.root)
+
+    def __iter__(self):
+        stack = []
+        node = self.root
+        while stack or node != None:
+            while node != None:
+                stack.append(node)
+                node = node.left
+            node = stack.pop()
+            yield node.val
+            node = node.right
+
+    # Returns the element at position i.  Raises an IndexError if there is no
+    # such position, just as a python list would.
+    def __getitem__(self, i):
+        i = self.__position(i)
+        node = self.root
+        while True:
+            left_size = _size(node.left)
+            if i < left_size:
+                node = node.left
+            elif i > left_size:
+                i -= left_size + 1
+                node = node.right
+            else:
+                return node.val
+
+    # The five functions below each return a new PVector, leaving the original
+    # one untouched.
+    def set(self, i, val):
+        return self.__new(_set(self.root, self.__position(i), val))
+
+    def insert(self, i, val):
+        # like list.insert(), positions past either end are allowed
+        if not isinstance(i, (int, long)):
+            raise TypeError("PVector indices must be integers")
+        if i < 0:
+            i = max(i + len(self), 0)
+        return self.__new(_insert(self.root, min(i, len(self)), val))
+
+    def remove(self, i):
+        return self.__new(_remove(self.root, self.__position(i)))
+
+    def append(self, val):
+        return self.insert(len(self), val)
+
+    def push(self, val):
+        return self.insert(0, val)
+
+    # Returns the elements as a python list.
+    def to_list(self):
+        return list(self)
+
+
+    # Turns a (possibly negative) position into an index from the front of the
+    # list.
+    def __position(self, i):
+        if not isinstance(i, (int, long)):
+            raise TypeError("PVector indices must be integers")
+        if i < 0:
+            i += len(self)
+        if i < 0 or i >= len(self):
+            raise IndexError("PVector index out of range")
+        return i
+
+    def __new(self, root):
+        vector = PVector()
+        vector.root = root
+        return vector
@@ -0,0 +1,102 @@
+#
+# Matthew Epstein
+# screen.py
+# Holds the screen buffer behind the setCell, writeRow, and present
+# primitives.  A program that redraws a board every frame with clear_screen
+# and a print per row makes the terminal repaint the entire screen each time,
+# which is slow and flickers.  Instead, a program can draw into the screen
+# buffer (which keeps its contents from one frame to the next) and call
+# present once the frame is finished.  present() compares the buffer with the
+# frame it last presented and only sends the terminal the characters that have
+# changed, each run of them preceded by a move of the cursor.  Rows and columns
+# are counted from 0, starting at the top left of the screen.
+#
+
+
+import output
+
+rows = [] # the frame being drawn, as a list of lists of characters
+shown = None # the rows last presented, as strings (None if none are shown)
+
+
+# Writes text into the buffer starting at the given row and column, padding
+# the row with spaces if it is not yet long enough.
+def set_cell(row, col, text):
+    (row, col) = __check_position(row, col)
+    while len(rows) <= row:
+        rows.append([])
+    if len(rows[row]) < col + len(text):
+        rows[row].extend([" "] * (col + len(text) - len(rows[row])))
+    rows[row][col:col+len(text)] = list(text)
+    return "Nothing"
+
+
+# Replaces the entire contents of a row of the buffer.
+def write_row(row, text):
+    (row, _) = __check_position(row, 0)
+    while len(rows) <= row:
+        rows.append([])
+    rows[row] = list(text)
+    return "Nothing"
+
+
+# Brings the screen up to date with the buffer.  The first frame is drawn on
+# a cleared screen; after that only the changes are drawn.  The cursor is left
+# on the line below the frame, so that anything printed afterwards does not
+# overwrite it.
+def present():
+    global shown
+    new = ["".join(row) for row in rows]
+    if shown == None:
+        output.write("\033[H\033[J")
+        shown = []
+
+    changes = []
+    for i in range(max(len(new), len(shown))):
+        old_row = shown[i] if i < len(shown) else ""
+        new_row = new[i] if i < len(new) else ""
+        if old_row != new_row:
+            changes.append(__row_changes(i, old_row, new_row))
+    changes.append("\033[{};1H".format(len(new)+1))
+
+    output.write("".join(changes))
+    output.flush()
+    shown = new
+    return "Nothing"
+
+
+# Clears the screen.  Since the screen no longer shows the last frame, the
+# next frame is drawn in full.
+def clear_screen():
+    global shown
+    output.write("\033[H\033[J\n")
+    shown = None
+    return "Nothing"
+
+
+# Returns what must be sent to the terminal to turn old_row into new_row: a
+# cursor move followed by the characters for each run of changed characters,
+# and a clear to the end of the line if the row has become shorter.
+def __row_changes(i, old_row, new_row):
+    changes = []
+    col = 0
+    while col < len(new_row):
+        if col < len(old_row) and old_row[col] == new_row[col]:
+            col += 1
+            continue
+        start = col
+        while col < len(new_row) and \
+                        (col >= len(old_row) or old_row[col] != new_row[col]):
+            col += 1
+        changes.append("\033[{};{}H{}".format(i+1, start+1, new_row[start:col]))
+    if len(new_row) < len(old_row):
+        changes.append("\033[{};{}H\033[K".format(i+1, len(new_row)+1))
+    return "".join(changes)
+
+
+# Raises an error if the row or column is not a whole number at least 0, and
+# otherwise returns them as ints.
+def __check_position(row, col):
+    if row != int(row) or col != int(col) or row < 0 or col < 0:
+        raise ValueError("no such position on the screen")
+    return (int(row), int(col))
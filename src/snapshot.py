@@ -0,0 +1,88 @@
+#
+# Matthew Epstein
+# snapshot.py
+# Saves the state of the interpreter to a file, and restores it, so that a
+# program that spends a long time setting things up (eg. building tables with
+# val) can skip the setup the next time it is run.  Calling the snapshot
+# primitive with the name of a file marks the line it is on: once that line
+# has been evaluated, everything the rest of the program could see is saved to
+# the file.  That is the variable environment (including the "it" binding),
+# the user-defined functions defined up to the marked line, and their pattern
+# matching classes (see addPM() in env.py).  Running pscm with --resume and the
+# name of the file restores all of this and starts evaluating at the line
+# after the marked one.
+# A snapshot file is a line naming its format and the version of the format,
+# followed by the state, pickled with python's fastest and most compact
+# protocol.  A snapshot also records the text of the file up to the marked
+# line and is refused if that text has changed, since the state it holds
+# would then be out of date.  As with any pickle, only resume from snapshot
+# files you made yourself.
+# Like global_vars.py, this file "includes" no other p-scheme file.
+#
+
+
+import cPickle
+import hashlib
+
+MAGIC = "pscm snapshot"
+VERSION = 1
+
+requested = None # the file the current line asked to be snapshot to
+resume_from = None # the file given with --resume
+
+
+# Saves the state after the top-level expression ending on line mark to the
+# file the snapshot primitive asked for.  lines are the lines of the program.
+def save(mark, lines, varEnv, funEnv):
+    global requested
+    (path, requested) = (requested, None)
+    functions = dict()
+    for name in funEnv.env:
+        # Only user-defined functions record where they are defined.
+        definition = funEnv.env[name][0][0]
+        if isinstance(definition, tuple) and len(definition) == 4 and \
+                                                    definition[3][0] <= mark:
+            functions[name] = funEnv.env[name]
+    state = {"line": mark, "source": __digest(lines[:mark]), \
+             "variables": varEnv.env, "functions": functions, \
+             "PMs": dict([(name, funEnv.PMs[name]) \
+                          for name in funEnv.PMs if name in functions])}
+    try:
+        with open(path, "wb") as snapshot_file:
+            snapshot_file.write("{} {}\n".format(MAGIC, VERSION))
+            cPickle.dump(state, snapshot_file, cPickle.HIGHEST_PROTOCOL)
+    except (IOError, OSError):
+        return ("error", "Error: Snapshot can't be written")
+    return ("not_error", path)
+
+
+# Restores the state saved in the file given with --resume into the two
+# environments.  lines are the lines of the program being resumed.  Returns
+# the line the snapshot was taken at.
+def load(lines, varEnv, funEnv):
+    try:
+        with open(resume_from, "rb") as snapshot_file:
+            header = snapshot_file.readline().split()
+            if " ".join(header[:-1]) != MAGIC:
+                return ("error", "Error: Not a snapshot")
+            if header[-1] != str(VERSION):
+                return ("error", "Error: Snapshot is from another version")
+            state = cPickle.load(snapshot_file)
+    except (IOError, OSError):
+        return ("error", "Error: Snapshot can't be read")
+    except (cPickle.UnpicklingError, EOFError, AttributeError, \
+                                                    ImportError, IndexError):
+        return ("error", "Error: Snapshot is damaged")
+
+    if state["source"] != __digest(lines[:state["line"]]):
+        return ("error", "Error: File has changed since the snapshot")
+    varEnv.env = state["variables"]
+    varEnv.version += 1
+    funEnv.env.update(state["functions"])
+    funEnv.PMs.update(state["PMs"])
+    funEnv.version += 1
+    return ("not_error", state["line"])
+
+
+def __digest(lines):
+    return hashlib.sha1("\n".join(lines)).hexdigest()
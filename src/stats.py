@@ -0,0 +1,60 @@
+#
+# Matthew Epstein
+# stats.py
+# Counts how often the interpreter does the things that take up most of its
+# time: building and rebalancing trees, turning lists into strings and back,
+# looking up and binding names, checking the arguments of primitives, trying
+# patterns, and calling user-defined functions.  Knowing which of these a
+# program does most of tells us where to look before trying to make it faster.
+# Counting is off unless pscm is run with the --stats option, in which case
+# the counts are written to standard error, as text or as JSON, when the
+# program exits.  So that counting costs nothing when it is off, every caller
+# checks stats.enabled before calling count() or record_max().
+# Of the other p-scheme files, this file "includes" only output.py.
+#
+
+
+import atexit
+import json
+import sys
+import output
+
+FORMATS = ["text", "json"]
+
+enabled = False
+report_format = "text"
+counts = dict()
+
+
+# Turns counting on.  The counts are reported in the given format (one of
+# FORMATS) when the program exits.
+def enable(new_format):
+    global enabled, report_format
+    enabled = True
+    report_format = new_format
+    atexit.register(report)
+
+
+# Adds amount to the count with the given name.
+def count(name, amount=1):
+    counts[name] = counts.get(name, 0) + amount
+
+
+# Keeps the largest value seen under the given name.
+def record_max(name, value):
+    if name not in counts or value > counts[name]:
+        counts[name] = value
+
+
+# Writes the counts to standard error, after anything the program has printed.
+def report():
+    output.flush()
+    if report_format == "json":
+        sys.stderr.write(json.dumps(counts, sort_keys=True, indent=2, \
+                                            separators=(",", ": ")) + "\n")
+        return
+    width = max([len(name) for name in counts] + [0])
+    sys.stderr.write("Statistics:\n")
+    for name in sorted(counts):
+        sys.stderr.write("  {}  {:>10}\n".format(name.ljust(width), \
+                                                                counts[name]))
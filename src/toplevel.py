@@ -0,0 +1,359 @@
+#
+# Matthew Epstein
+# toplevel.py
+# This file holds the functions that set up the environments and deal with
+# the top-level expressions of a program: addPrimitives() creates the starting
+# environments, function_check() adds a program's user-defined functions to
+# the function environment, and evaluate_expression() evaluates a single
+# top-level expression.  They are kept out of pscm, which only has to read the
+# file and go through its expressions in order, so that a python program can
+# use them to run p-scheme without starting pscm (see embed.py).
+#
+
+
+from __future__ import print_function #otherwise print cannot be in a lambda
+import math
+import operator
+import budget
+import global_vars
+import memprofile
+import output
+import snapshot
+import stats
+from comments import *
+from env import *
+from error_handling import *
+from expTree import *
+from frames import *
+from getch import *
+from index_base import *
+from makeTree import *
+from node import *
+from list_string_handling import *
+from pattern_matching import *
+from primitives import *
+from screen import *
+
+
+# Creates the starting environments by adding all the primitive functions to
+# the function environments and adding the "it" variable to the variable
+# environment (and initializing it as Nothing).
+def addPrimitives():
+    varEnv = Environment()
+    varEnv.addBind("it", "Nothing")
+
+    funEnv = Environment()
+    # arithmetic
+    funEnv.addBind("+", (numArrityTwo, operator.add, 2))
+    funEnv.addBind("-", (numArrityTwo, operator.sub, 2))
+    funEnv.addBind("*", (numArrityTwo, operator.mul, 2))
+    funEnv.addBind("/", (numArrityTwo, operator.div, 2))
+    funEnv.addBind("%", (numArrityTwo, operator.mod, 2))
+    funEnv.addBind("**", (numArrityTwo, operator.pow, 2))
+    funEnv.addBind("random", (numArrityTwo, randint, 2))
+    funEnv.addBind("!", (numArrityOne, math.factorial, 1))
+    funEnv.addBind("v/", (numArrityOne, math.sqrt, 1))
+    # booleans
+    funEnv.addBind("and", (booleans, operator.and_, 2))
+    funEnv.addBind("or", (booleans, operator.or_, 2))
+    funEnv.addBind("xor", (booleans, operator.xor, 2))
+    funEnv.addBind("nand", (booleans, (lambda x, y: not (x and y)), 2))
+    funEnv.addBind("nor", (booleans, (lambda x, y: not (x or y)), 2))
+    funEnv.addBind("not", (boolNot, operator.not_, 1))
+    # comparison
+    funEnv.addBind(">", (comparison, operator.gt, 2))
+    funEnv.addBind("<", (comparison, operator.lt, 2))
+    funEnv.addBind(">=", (comparison, operator.ge, 2))
+    funEnv.addBind("<=", (comparison, operator.le, 2))
+    funEnv.addBind("=", (equal_nequal, operator.eq, 2))
+    funEnv.addBind("<>", (equal_nequal, operator.ne, 2))
+    # range
+    funEnv.addBind("range", (numArrityOne, budget.limited_range, 1))
+    funEnv.addBind("rangeFrom", (numArrityTwo, budget.limited_range, 2))
+    # lists
+    funEnv.addBind("today", (arrityZero, (lambda: today()), 0))
+    funEnv.addBind("newList", (arrityZero, (lambda: []), 0))
+    funEnv.addBind("length", (listArrityOne, (lambda x: len(x)), 1))
+    funEnv.addBind("null?", \
+            (listArrityOne, (lambda x: "true" if len(x)==0 else "false"), 1))
+    funEnv.addBind("append", (append_push, (lambda val, ds: ds.append(val)), 2))
+    funEnv.addBind("push", (append_push, (lambda val, ds: ds.push(val)), 2))
+    funEnv.addBind("get", (listGet, (lambda pos, ds: ds[pos-today()]), 2))
+    funEnv.addBind("put", (listPut, \
+        (lambda val,pos,ds: ds.set(pos-today(), val)), 3))
+    funEnv.addBind("init", (listInit, (lambda val, size: [val]*size), 2))
+    funEnv.addBind("insert", \
+            (listInsert, (lambda val,pos,ds: ds.insert(pos-today(),val)), 3))
+    funEnv.addBind("remove", (listRemove,
+        (lambda pos,ds: ds.remove(pos-today())), 2))
+    # miscellaneous
+    funEnv.addBind("seven", (arrityZero, (lambda: 7), 0))
+    funEnv.addBind("clear_screen", (arrityZero, (lambda: clear_screen()), 0))
+    # drawing frames (see screen.py)
+    funEnv.addBind("setCell", (screenWrite, set_cell, 3))
+    funEnv.addBind("writeRow", (screenWrite, write_row, 2))
+    funEnv.addBind("present", (arrityZero, (lambda: present()), 0))
+    funEnv.addBind("exit", (arrityZero, (lambda: exit(1)), 0))
+    funEnv.addBind("wholesomeRemark", (happy, None, 0))
+    funEnv.addBind("++", (concat, operator.add, 2))
+    # casting
+    funEnv.addBind("int", (numArrityOne, (lambda x: int(x)), 1))
+    funEnv.addBind("num", (castNum, native_num, 1))
+    funEnv.addBind("bool", (castBool, None, 1))
+    funEnv.addBind("str", (castStr, (lambda x: "\""+x+"\""), 1))
+    funEnv.addBind("list", (castList, (lambda x: "["+str(x)+"]"), 1))
+    funEnv.addBind("nonetype", (castNonetype, None, 1))
+    # higher-order list functions
+    funEnv.addBind("map", (listMap, None, 2))
+    funEnv.addBind("fold", (listFold, None, 3))
+    funEnv.addBind("filter", (listFilter, None, 2))
+    funEnv.addBind("all", (listAll, None, 2))
+    funEnv.addBind("exists", (listExists, None, 2))
+    # basic operations
+    funEnv.addBind("print", \
+                        (printVar, (lambda x: output.write(str(x) + "\n")), 1))
+    funEnv.addBind("write", (printVar, (lambda x: output.write(str(x))), 1))
+    funEnv.addBind("input", (userInput, (lambda x: read_line(x)), 1))
+    funEnv.addBind("getch", (getChar, (lambda: getch()), 0))
+    funEnv.addBind("getchTimeout", \
+                        (getCharTimeout, (lambda x: getch.timeout(x)), 1))
+    # real-time programs
+    funEnv.addBind("tick", (numArrityOne, (lambda x: tick(x)), 1))
+    funEnv.addBind("sleep", (numArrityOne, (lambda x: sleep(x)), 1))
+    funEnv.addBind("val", (defineVar, None, 2))
+    funEnv.addBind("check-error", (check_error, None, 1))
+    funEnv.addBind("check-expect", (check_expect, None, 2))
+    funEnv.addBind("empty", (empty, None, 0))
+    funEnv.addBind("if", (conditional, None, 3))
+    funEnv.addBind("ifTrue", (condArrityTwo, (lambda: True), 2))
+    funEnv.addBind("ifFalse", (condArrityTwo, (lambda: False), 2))
+    funEnv.addBind("while", (wloop, None, 2))
+    funEnv.addBind("for", (floop, None, 4)) # second argument is the "in" keyword
+    funEnv.addBind("claim", (claim, None, 1))
+    funEnv.addBind("snapshot", (snapshotState, None, 1))
+
+    return (varEnv, funEnv)
+
+
+# Does an initial scan of the expressions of the file (see logical_lines() in
+# comments.py), adding user-defined functions to the function environment.
+# After a user-defined function has been added, that function definition is
+# erased from the expressions that are to be evaluated in the evaluate()
+# function.  evaluate() would otherwise evaluate the function definition, which
+# is obviously incorrect: a function should only be evaluated when it is
+# actually called.  This function ensures every user-defined function is in an
+# acceptable format.  It also initializes the pattern matching classes.  It
+# looks through the various function definitions, adds the patterns, and will
+# raise errors if a pattern is of a bad format, if patterns are over-exhaustive
+# (i.e. an input could match against two different patterns), or if patterns
+# are under-exhaustive (i.e. there exists an input that would not match
+# against any pattern).  Finally, it records where in the file each expression
+# of a function's body is (the function's "source map"), so that errors raised
+# within the function can point to the right lines.
+def function_check(logical, origLines, funEnv):
+    global_vars.function_check = True
+    function_definition = False
+
+    for exp_num in range(len(logical)):
+        if logical[exp_num] == None: # skipped by resume()
+            continue
+        (status, fullExp, lineCount, numLines) = logical[exp_num]
+        if status == "error":
+            global_vars.function_check = False
+            return
+        if status != "finished":
+            continue
+        line = lineCount - 1
+
+        expression = handleQuotesAndBrackets(fullExp)
+        if isinstance(expression, int):
+            global_vars.function_check = False
+            if fullExp[-11:] == "check-error":
+                continue
+            else:
+                return
+        expression.reverse()
+
+        if expression[0] == "define":
+            if function_definition:
+                val = "Error: Can't define a function within a function"
+                origLines.RaiseException(lineCount, numLines, val, 3)
+            if len(expression) != 3:
+                val = "Error: Incorrect number of arguments"
+                origLines.RaiseException(lineCount, numLines, val, 3)
+            if isList(expression[2]) and string_check(expression[2]) != None:
+                (error, val) = string_check(expression[2])
+                origLines.RaiseException(lineCount, numLines, val, 3)
+
+            constraints = [[["list"]]]
+            empty = Environment()
+            try:
+                (toAppend, constraints[0][0]) = \
+                    general_type(expression[2], constraints[0], empty, empty)
+            except EvalError as error:
+                origLines.RaiseException(lineCount, numLines, error.message, 3)
+                toAppend = expression[2]
+            val_list = [toAppend]
+
+            if var_check(string_to_list(expression[2])):
+                val = "Error: Word is reserved"
+                origLines.RaiseException(lineCount, numLines, val, 3)
+
+            reserved_terms = global_vars.PRIMITIVES + \
+                                            ["error,", "it", "in", "done"]
+            reserved_symbols = ["\"", "[", "]", "<~", ".", "<'>", "//", "|"]
+
+            if isLiteral(expression[1]) or expression[1] in reserved_terms:
+                val = "Error: Word is reserved"
+                origLines.RaiseException(lineCount, numLines, val, 3)
+            for i in reserved_symbols:
+                if i in expression[1]:
+                    val = "Error: Name contains reserved symbol"
+                    origLines.RaiseException(lineCount, numLines, val, 3)
+
+            val_list[0] = string_to_list(val_list[0])
+
+            function_definition = True
+            function_lineCount = lineCount
+            function_numLines = numLines
+            name = expression[1]
+            arrity = len(val_list[0]) 
+            function_body = [expression]
+            source_map = []
+            logical[exp_num] = None
+            continue
+        elif function_definition:
+            if expression == ["done"]:
+                function_definition = False
+                funEnv.addBind(name, (userFun, function_body, arrity, \
+                                        [function_lineCount, line, source_map]))
+                logical[exp_num] = None
+                if funEnv.getNumFuncs(name) != 1:
+                    literalType = get_pattern_type(name, funEnv, 0) #0 will eventually change to an iterator in a for loop
+                    if literalType[0] == "error":
+                        start = funEnv.getFunc(name)[0][0][3][0]
+                        origLines.RaiseException(start, 1, literalType[1], 3)
+                    else:
+                        PM = PatternMatching(literalType[1])
+                    for i in range(funEnv.getNumFuncs(name)):
+                        param = funEnv.getFunc(name)[i][0][1][0][-1][1:-1]
+                        (error, val) = PM.addPattern(param)
+                        if error == "error":
+                            start = funEnv.getFunc(name)[i][0][3][0]-1
+                            end = funEnv.getFunc(name)[i][0][3][1]-1
+                            numLines = end - start
+                            origLines.RaiseException(start+numLines, \
+                                                            numLines, val, 3)
+                    if not PM.isComplete():
+                        start = funEnv.getFunc(name)[0][0][3][0]-1
+                        end = funEnv.getFunc(name)\
+                                        [len(funEnv.getFunc(name))-1][0][3][1]
+                        numLines = end - start + 1
+                        val = "Error: Pattern matching not exhaustive"
+                        origLines.RaiseException(start+numLines, \
+                                                            numLines, val, 3)
+                    else:
+                        funEnv.addPM(name, PM)
+
+            elif expression[0] == "|":
+                funEnv.addBind(name, (userFun, function_body, arrity, \
+                                        [function_lineCount, line, source_map]))
+                logical[exp_num] = None
+                function_lineCount = line + 1
+                function_body = [expression]
+                source_map = []
+
+            else:
+                function_body.append(expression)
+                source_map.append((lineCount, numLines))
+                logical[exp_num] = None
+        else:
+            if expression == ["done"] or expression[0] == "|":
+                val = "Error: No function definition in progress"
+                origLines.RaiseException(lineCount, numLines, val, 3)
+
+    if function_definition:
+        val = "Error: It never ends"
+        origLines.RaiseException(function_lineCount, function_numLines, val, 3)
+    global_vars.function_check = False
+
+
+# Parses, builds the tree of, and evaluates a single top-level expression
+# that spans the lines ending with line lineCount, and handles the result.
+# Returns the result (the new value of "it").
+def evaluate_expression(fullExp, lineCount, numLines, origLines, varEnv, \
+                                                                       funEnv):
+    expression = handleQuotesAndBrackets(fullExp)
+
+    if isinstance(expression, int):
+        if global_vars.check_error:
+            global_vars.check_error = False
+            val = "Expression failed, as expected"
+            output.write("--> " + str(val) + "\n")
+            return val
+        else:
+            if expression == 1:
+                val = "Error: Inconsistent brackets"
+            if expression == 2:
+                val = "Error: It never ends"
+            if expression == 3:
+                val = "Error: Escaping when no escape is necessary"
+            origLines.RaiseException(lineCount, numLines, val)
+    expression.reverse()
+
+    if memprofile.enabled:
+        memprofile.start_line(lineCount-numLines+1, lineCount)
+    locEnv = Environment()
+    emptyTree = ExpressionTree(expression)
+    expTree = makeTree(emptyTree, funEnv, 0, False)
+    expTree.epsteinCheck(varEnv, funEnv, emptyTree, [locEnv])
+    #expTree.printTree()
+
+    try:
+        if budget.enabled:
+            budget.check()
+        if emptyTree.get_string_length() != 0:
+            raise EvalError("Error: Incorrect number of arguments")
+        expTree.seven_and_checkCheck()
+        if expTree.containsLoop():
+            expTree.foldConstants(varEnv, funEnv, [locEnv])
+        expTree.markCommonSubtrees()
+        val = expTree.evaluateTree(varEnv, funEnv, [locEnv])
+        if "<'>" in val: # see userFun() in primitives.py
+            val = val.replace("<'>", "\"")
+    except EvalError as error:
+        val = __report(error, lineCount, numLines, origLines)
+
+    if global_vars.check_error or global_vars.check_expect:
+        output.write("--> " + str(val) + "\n")
+
+    if global_vars.check_error or global_vars.check_expect:
+        varEnv.addBindit("it", "\"" + val + "\"")
+    else:
+        varEnv.addBindit("it", val)
+    if snapshot.requested != None:
+        (error, val) = snapshot.save(lineCount, origLines.lines, varEnv, funEnv)
+        if error == "error":
+            origLines.RaiseException(lineCount, numLines, val)
+    global_vars.reset()
+    if memprofile.enabled:
+        memprofile.end_line()
+    return val
+
+
+# Reports an error raised while evaluating the top-level expression that ends
+# on line lineCount.  An error raised within the body of a user-defined
+# function is reported at the expression of the body that raised it.  Within a
+# check-error nothing is reported, and the check's result is returned instead.
+def __report(error, lineCount, numLines, origLines):
+    # an error raised in a function body was given its location by userFun()
+    # (see primitives.py), which has already popped that function
+    if not global_vars.check_error and error.location != None:
+        (lineCount, numLines) = error.location
+        special = 0
+    else:
+        # limits, like claims, are not caught by check-error (see budget.py)
+        specials = {"errorDec": 1, "claim_failed": 2, "limit": 2}
+        special = specials.get(error.kind, 0)
+    return origLines.RaiseException(lineCount, numLines, error.message, \
+                                                                    special)[1]
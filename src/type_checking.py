@@ -14,10 +14,18 @@ import operator
 import global_vars
 from env import *
 from random import *
-from decimal import Decimal
+from values import *
 
-# The eight functions below are all fairly self-explanatory.
+# The eight functions below are all fairly self-explanatory.  The type of a
+# Value or a Token is already known, so it does not need to be worked out from
+# the string, and neither is the type of a python number.
 def isNum(x):
+    if isinstance(x, Value):
+        return x.val_type == "num"
+    if isinstance(x, Token):
+        return False
+    if isinstance(x, NUMBER_TYPES):
+        return True
     try:
         isinstance(float(x), float)
         return True
@@ -25,12 +33,20 @@ def isNum(x):
         return False
 
 def isBool(x):
+    if isinstance(x, Value):
+        return x.val_type == "bool"
+    if isinstance(x, Token):
+        return False
     return (x == "true" or x == "false" or x == "maybe")
 
 
 def isString(x):
     # calling isString() on a number would otherwise return an error since
     # numbers don't have the [] property
+    if isinstance(x, Value):
+        return x.val_type == "str"
+    if isinstance(x, Token):
+        return False
     if isNum(x):
         return False
     
@@ -42,6 +58,10 @@ def isString(x):
     return (x[0] == "\"" and x[-1] == "\"")   #if x is of the "___" format
 
 def isList(x):
+    if isinstance(x, Value):
+        return x.val_type == "list"
+    if isinstance(x, Token):
+        return x.kind == "list"
     if x == None or x == "" or isNum(x): #"object has no attribute __getitem__" error
         return False
 
@@ -51,10 +71,18 @@ def isList(x):
     return (x[0] == "[" and x[-1] == "]")   #if x is of the [___] format
 
 def isNothing(x):
+    if isinstance(x, Value):
+        return x.val_type == "nonetype"
+    if isinstance(x, Token):
+        return False
     return (x == "Nothing")
 
 
 def isLiteral(x):
+    if isinstance(x, Value):
+        return True
+    if isinstance(x, Token):
+        return x.kind == "list"
     return (isNum(x) or isBool(x) or isString(x) or isList(x) or isNothing(x))
 
 # must update as more types are added
@@ -62,6 +90,8 @@ def isValidType(x):
     return (x in global_vars.ALL_TYPES)
 
 def getLiteralType(x):
+    if isinstance(x, Value):
+        return x.val_type
     if isNum(x):
         return "num"
     if isBool(x):
@@ -83,26 +113,33 @@ def isUndesirableType(x, desired_types):
                                                 global_vars.ALL_TYPES, False)
 
 
-# Ensures that a literal matches its constraint
+# Returns True if a literal matches its constraint and False otherwise
 def check_expected_literal_type(arg, constraint):
     if isNum(arg) and constraint == "num":
-        return arg
+        return True
     if isBool(arg) and constraint == "bool":
-        return arg
+        return True
     if isString(arg) and constraint == "str":
-        return arg
+        return True
     if isList(arg) and constraint == "list":
-        return arg
+        return True
     if isNothing(arg) and constraint == "nonetype":
-        return arg
-    return ("error", "Error: Bad type")
+        return True
+    return False
 
 
 # This comment strips the dot from an argument (eg. x.int) and uses the
 # information from the dot (if it was present) as well as the constraint to
-# solve the argument's type.
+# solve the argument's type.  Raises an EvalError if the argument does not
+# exist or is of the wrong type.
 def general_type(arg, constraints, varEnv, locEnv):
-    if not isLiteral(arg):
+    if isinstance(arg, Value):
+        if arg.val_type in constraints[0]:
+            return (arg, [arg.val_type])
+        raise EvalError("Error: Bad type")
+    if isinstance(arg, Token):
+        arg_split = arg.parts[:]
+    elif not isLiteral(arg):
         arg_split = arg.split(".")
     else:
         arg_split = [arg]
@@ -121,18 +158,16 @@ def general_type(arg, constraints, varEnv, locEnv):
             arg = arg_split[0]
             constraints = [arg_split[1]]
         elif isLiteral(arg_split[0]):
-            return (("error", "Error: Argument does not support dot operation"), \
-                                                                    constraints)
+            raise EvalError("Error: Argument does not support dot operation")
         elif arg_split[1] not in global_vars.ALL_TYPES:
-            return (("error", "Error: Argument type does not exist"), \
-                                                                    constraints)
+            raise EvalError("Error: Argument type does not exist")
         elif arg_split[1] not in constraints[0]:
-            return (("error", "Error: Bad type"), constraints)
+            raise EvalError("Error: Bad type")
         elif not varEnv.inEnv(arg_split[0]) and not varEnv.inEnv(arg_split[0]):
-            return (("error", "Error: Argument does not exist"), constraints)
+            raise EvalError("Error: Argument does not exist")
         elif isUndesirableType(arg_split[1], locEnv.getVarTypes(arg_split[0])) \
           and isUndesirableType(arg_split[1], varEnv.getVarTypes(arg_split[0])):
-            return (("error", "Error: Bad type"), constraints)
+            raise EvalError("Error: Bad type")
     else: #if var is a literal
         env_fun = lambda acc, x: acc or x.inEnv(arg_split[0])
         if reduce(env_fun, [locEnv, varEnv], False):
@@ -141,22 +176,19 @@ def general_type(arg, constraints, varEnv, locEnv):
                 intersection = [x for x in typesOfArg if x in constraints[0]]
                 if intersection == []:
                     if env == varEnv:
-                        return (("error", "Error: Bad type"), constraints)
+                        raise EvalError("Error: Bad type")
                 else:
                     constraints = intersection
                     break
         elif isLiteral(arg):
             for i in range(len(constraints[0])):
-                errorTest = check_expected_literal_type(arg, constraints[0][i])
-                if errorTest == "" or errorTest[0] != "error":
-                    arg = errorTest
+                if check_expected_literal_type(arg, constraints[0][i]):
                     constraints = [getLiteralType(arg)]
                     break
                 elif i == len(constraints[0])-1:
-                    return (errorTest, constraints)
+                    raise EvalError("Error: Bad type")
         else:
-            print arg
-            return (("error", "Error: Argument does not exist"), constraints)
+            raise EvalError("Error: Argument does not exist")
     return (arg, constraints)
 
 
@@ -179,15 +211,20 @@ def constraintCheck(arg, constraints, varEnv, locEnv):
 
 
 # All arguments are originally entered as a string.  This function "casts" the
-# argument to its actual value.
+# argument to its actual value.  Raises an EvalError if the argument is a
+# number too big to be read.
 def casted(arg):
+    if isinstance(arg, Value):
+        if arg.val_type == "num":
+            return arg.native
+        if arg.val_type == "bool":
+            return getBoolVal(arg)
+        return arg
     if isNum(arg):
-        try:
-            if Decimal(arg) == int(Decimal(arg)):
-                return int(Decimal(arg))
-        except:
-            return ("error", "Error: To infinity and beyond")
-        return float(arg)
+        num = native_num(arg)
+        if num == None:
+            raise EvalError("Error: To infinity and beyond")
+        return num
     if isBool(arg):
         return getBoolVal(arg)
     if isString(arg):
@@ -198,6 +235,34 @@ def casted(arg):
         return str(arg)
 
 
+# Classifies a token of source code, so that later stages do not have to
+# inspect its characters again.  Literals become Values holding what casting
+# them would produce and everything else becomes a Token.  The rare literal
+# that cannot be cast (eg. inf) is left as it is, so that it raises the same
+# error it always has.
+def classify_token(token):
+    if isNum(token):
+        try:
+            return Value(token, "num", casted(token))
+        except EvalError:
+            return token
+    if token == "maybe":
+        return Value(token, "bool")
+    if isBool(token):
+        return bool_value(token == "true")
+    if isString(token):
+        return str_value(token)
+    if isList(token):
+        return Token(token, "list")
+    if isNothing(token):
+        return NOTHING
+    if token[:2] == "//":
+        return Token(token, "function")
+    if "." in token:
+        return Token(token, "dotted")
+    return Token(token, "identifier")
+
+
 # Translates p-scheme booleans into python booleans
 def getBoolVal(arg):
     if arg == "maybe":
@@ -211,8 +276,12 @@ def getBoolVal(arg):
 
 
 # By the time this function is called, all potential errors should have been
-# handled so arg will either be a literal or a variable of type constraint
+# handled so arg will either be a literal or a variable of type constraint.
+# The only error left is a number too big to be read, for which casted()
+# raises an EvalError.
 def getValofType(arg, constraint, varEnv, locEnv):
+    if isinstance(arg, Value):
+        return casted(arg)
     for env in [locEnv, varEnv]:
         if env.inEnvandType(arg, constraint[0]):
             return casted(env.getVal(arg, constraint[0]))
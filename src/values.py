@@ -0,0 +1,157 @@
+#
+# Matthew Epstein
+# values.py
+# This file holds the Value class, which represents a p-scheme value whose type
+# is already known.  Every value in p-scheme is passed around as a string (eg.
+# the number three is "3" and the empty list is "[]"), so deciding the type of
+# an argument normally means inspecting the characters of that string, which
+# the type-checking functions do many times per primitive call.  A Value is
+# still a string--it prints, compares, and slices exactly like the string it
+# was created from--but it also carries its p-scheme type and the python value
+# it stands for, so that the functions in type_checking.py, the environment,
+# and definePrimitive() can use them instead of re-parsing the string.  Only
+# results whose type is certain (eg. the result of an arithmetic primitive)
+# are made into Values.  Anything else, such as the name of a variable, stays
+# a plain string and is handled the way it always has been.
+# Like global_vars.py, this file "includes" no other file.
+#
+# Numbers are stored as python numbers of the types in NUMBER_TYPES.  Whole
+# numbers are kept as ints (or longs, which have no size limit), so that they
+# stay exact no matter how large they grow (eg. the result of (200 !)), and
+# every other number is a float.  A number is only turned into a string when it
+# is shown to the user or put into the string of a list.
+#
+
+
+from decimal import Decimal, InvalidOperation
+
+NUMBER_TYPES = (int, long, float)
+
+
+class Value(str):
+    # Creates a new Value.  string is the value's p-scheme representation and
+    # val_type is one of the types in global_vars.ALL_TYPES.  native is the
+    # python value the string stands for: the number for nums, True or False
+    # for bools, the text between the quotes for strs, and a PVector of the
+    # elements (see pvector.py) for lists.
+    def __new__(cls, string, val_type, native=None):
+        value = str.__new__(cls, string)
+        value.val_type = val_type
+        value.native = native
+        return value
+
+    # Allows Values to be copied and pickled with their types intact.
+    def __reduce__(self):
+        return (Value, (str(self), self.val_type, self.native))
+
+
+TRUE = Value("true", "bool", True)
+FALSE = Value("false", "bool", False)
+NOTHING = Value("Nothing", "nonetype", None)
+
+
+# The four functions below create Values of a given type.
+def num_value(num):
+    return Value(str(num), "num", num)
+
+def bool_value(boolean):
+    return TRUE if boolean else FALSE
+
+def str_value(string):
+    return Value(string, "str", string[1:-1])
+
+def list_value(string, vector=None):
+    return Value(string, "list", vector)
+
+
+# Reads a number from a string, returning None if the string is not a finite
+# number or is too big for a float.  Whole numbers (including ones written like
+# 3.0 or 1e300) are read exactly, as ints.  Only a number that fits in a float
+# is read exactly, since reading something like 1e3000000 exactly would take
+# far too long.
+def parse_num(string):
+    try:
+        return int(string)
+    except (TypeError, ValueError):
+        pass
+    try:
+        num = float(string)
+        exact = Decimal(string.strip())
+    except (TypeError, ValueError, InvalidOperation):
+        return None
+    if num in (float("inf"), float("-inf")) or num != num:
+        return None
+    if exact.is_zero():
+        return 0
+    if exact == exact.to_integral_value():
+        return int(exact)
+    return num
+
+
+# Stores a python number the way p-scheme does: floats that are whole numbers
+# become ints.
+def normalize_num(num):
+    if isinstance(num, float) and num.is_integer():
+        return int(num)
+    return num
+
+
+# Returns the number x stands for, whether x is already a python number, a num
+# Value, or a string (in which case it may be None; see parse_num()).
+def native_num(x):
+    if isinstance(x, Value) and x.val_type == "num":
+        return x.native
+    if isinstance(x, NUMBER_TYPES):
+        return normalize_num(x)
+    return parse_num(x)
+
+
+# Turns the python result of a primitive into its p-scheme representation.
+# Numbers become Values; everything else is turned into a string, exactly as
+# str() would have done.
+def to_value(val):
+    if isinstance(val, Value):
+        return val
+    if isinstance(val, (int, long, float)) and not isinstance(val, bool):
+        return num_value(val)
+    return str(val)
+
+
+# A token of source code that is not a Value: a list literal, the name of a
+# variable or function, a function reference (eg. //f), or a variable with a
+# dot (eg. x.num).  The kind of token and, for names, the pieces on either side
+# of the dot are worked out once when the line is tokenized.  List literals
+# are not Values because they still need to be checked for variables and for
+# their format before they can be used.
+class Token(str):
+    def __new__(cls, string, kind):
+        token = str.__new__(cls, string)
+        token.kind = kind
+        if kind == "list":
+            token.parts = [token]
+        else:
+            token.parts = string.split(".")
+        return token
+
+    def __reduce__(self):
+        return (Token, (str(self), self.kind))
+
+
+# Raised when evaluating an expression fails, and passed up through the
+# evaluator until something handles it: check-error, or evaluate_expression()
+# in toplevel.py, which reports it.  message is what the user is shown and kind
+# is "error" for an ordinary error, "claim_failed" for a claim that does not
+# hold, "errorDec" for the error whose message is the Declaration of
+# Independence, and "limit" for a program that went over a limit set in
+# budget.py.  If the error was raised within the body of a user-defined
+# function, function is the innermost such function and location is the (line
+# number, number of lines) of the expression of its body that raised it, as
+# recorded by function_check() in toplevel.py, so that the error can be
+# reported without searching the function's source for the expression.
+class EvalError(Exception):
+    def __init__(self, message, kind="error"):
+        Exception.__init__(self, message)
+        self.message = message
+        self.kind = kind
+        self.function = None
+        self.location = None
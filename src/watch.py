@@ -0,0 +1,175 @@
+#
+# Matthew Epstein
+# watch.py
+# Holds the Watcher class, which lets pscm --watch re-run a file after it has
+# been edited without re-running all of it.  While the file runs, the watcher
+# records, for each top-level expression, the global variables the expression
+# read and bound (including the functions it called, which read variables
+# too), the user-defined functions it called, and the variables as they were
+# just before it ran.  When the file is edited, the watcher works out the
+# first expression the edit could affect: the first expression whose text
+# changed, or that called a function whose definition changed.  The variables
+# are put back the way they were just before that expression, and from there
+# on an expression is only run again if its text changed, it calls a changed
+# function, or one of the variables it read is no longer bound as it was.
+# Any other expression is skipped, and the bindings it made last time are
+# simply made again.  Since skipped expressions are not run, only the output of
+# the expressions that were run again is shown.  (An expression whose result
+# is random, or that reads input, is assumed to do the same thing every time.)
+#
+
+
+import global_vars
+
+
+class Watcher:
+
+    # Initializes the class with no history: every expression of the first
+    # run is run.
+    def __init__(self):
+        self.history = [] # what was recorded for each expression, in order
+        self.definitions = dict() # maps each user function to its definition
+        self.changed = set() # the functions whose definitions just changed
+        self.first_affected = 0
+        self.offset = 0 # how far expressions after the edit have moved
+        self.new_history = []
+        self.index = 0 # the position of the expression being run
+        self.varEnv = None # the environment of the global variables
+        self.current = None # the record of the expression being run
+        self.ran = 0
+
+
+    # Compares the file that is about to run (its expressions' text, in
+    # order, and its function environment) with the one that ran last, and
+    # puts varEnv's variables back the way they were before the first
+    # expression that may need to run again.
+    def plan(self, texts, funEnv, varEnv):
+        definitions = self.__definitions(funEnv)
+        self.changed = set([name for name in \
+                            set(definitions) | set(self.definitions) \
+                            if definitions.get(name) != \
+                                                self.definitions.get(name)])
+        self.definitions = definitions
+        self.varEnv = varEnv
+
+        old_texts = [record["text"] for record in self.history]
+        prefix = 0
+        while prefix < min(len(texts), len(old_texts)) and \
+                                        texts[prefix] == old_texts[prefix]:
+            prefix += 1
+        self.first_affected = prefix
+        for i in range(prefix):
+            if self.history[i]["calls"] & self.changed:
+                self.first_affected = i
+                break
+        self.offset = len(old_texts) - len(texts)
+
+        if self.first_affected < len(self.history):
+            varEnv.env = \
+                    self.__copy(self.history[self.first_affected]["before"])
+        elif self.history != []:
+            varEnv.env = self.__copy(self.history[-1]["after"])
+        varEnv.version += 1
+        self.new_history = self.history[:self.first_affected]
+        self.index = 0
+        self.ran = 0
+
+
+    # Called before each top-level expression (after the header).  Returns
+    # True if the expression must be run, in which case the watcher starts
+    # recording what it does, and False if it can be skipped, in which case
+    # the bindings it made last time are made again.
+    def start(self, text):
+        varEnv = self.varEnv
+        i = self.index
+        self.index += 1
+        if i < self.first_affected:
+            return False
+
+        old = self.__old_record(i, text)
+        if old != None:
+            record = dict(old, before=self.__copy(varEnv.env))
+            for name in old["writes"]:
+                varEnv.env[name] = list(old["after"][name])
+            varEnv.version += 1
+            record["after"] = self.__copy(varEnv.env)
+            self.new_history.append(record)
+            return False
+
+        self.current = {"text": text, "before": self.__copy(varEnv.env), \
+                        "reads": set(), "writes": set(), "calls": set()}
+        varEnv.reads = self.current["reads"]
+        varEnv.writes = self.current["writes"]
+        global_vars.watch_calls = self.current["calls"]
+        return True
+
+
+    # Called after an expression that start() said must be run has been run.
+    def finish(self):
+        record = self.current
+        self.__stop()
+        record["after"] = self.__copy(self.varEnv.env)
+        self.new_history.append(record)
+        self.ran += 1
+
+
+    # Called when a run ends, whether or not it reached the end of the file.
+    # An expression that raised an error has no record, so it and everything
+    # after it will be run again next time.
+    def end_run(self):
+        self.__stop()
+        self.history = self.new_history
+
+
+    # Returns the number of expressions run during the last run.
+    def expressions_run(self):
+        return self.ran
+
+
+    # Turns recording off.
+    def __stop(self):
+        if self.varEnv != None:
+            self.varEnv.reads = None
+            self.varEnv.writes = None
+        global_vars.watch_calls = None
+        self.current = None
+
+
+    # Returns what was recorded last time for an expression that would do
+    # exactly the same thing now, or None if there is no such record.  That is
+    # the case if the expression has the same text, calls no function whose
+    # definition has changed, and every variable it read is bound just as it
+    # was last time.  The expression is looked for where it was last time,
+    # either at the same place (if it came before the edit) or moved by as many
+    # expressions as were added or removed (if it came after).
+    def __old_record(self, i, text):
+        for j in [i, i + self.offset]:
+            if j < 0 or j >= len(self.history):
+                continue
+            old = self.history[j]
+            if old["text"] != text or old["calls"] & self.changed:
+                continue
+            if all(self.varEnv.env.get(name) == old["before"].get(name) \
+                                                    for name in old["reads"]):
+                return old
+        return None
+
+
+    # Returns what defines each user function: the text of its clauses and
+    # its arrity (but not where in the file it is).
+    def __definitions(self, funEnv):
+        definitions = dict()
+        for name in funEnv.env:
+            clauses = funEnv.env[name]
+            if clauses[0][1] == "function" and \
+                                        name not in global_vars.PRIMITIVES:
+                definitions[name] = repr([(str(clause[0][1]), clause[0][2]) \
+                                                    for clause in clauses])
+        return definitions
+
+
+    # Copies an environment's bindings.  The values themselves never change,
+    # so only the lists that hold them are copied.
+    def __copy(self, env):
+        return dict([(name, list(bindings)) \
+                                    for (name, bindings) in env.items()])